@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import pygame
+
+
+def resource_path(relative_path):
+    if hasattr(sys, '_MEIPASS'):
+        return os.path.join(sys._MEIPASS, relative_path)
+    return os.path.join(os.path.abspath("."), relative_path)
+
+
+PLAYER_COLORKEY = (255, 255, 255)  # white background of the john sprites
+GHOST_COLORKEY = (254, 254, 254)   # off-white background of the ghost sprites
+
+
+def directionalFrames(images):  # returns frames[direction][animation frame] ready to blit
+    # this builds a new table every call, whoever owns the images keeps it (see AssetRegistry.player_frames)
+    return [
+        list(images),                                                     # 0: right, as drawn
+        [pygame.transform.flip(image, True, False) for image in images],  # 1: left
+        [pygame.transform.rotate(image, 90) for image in images],         # 2: up
+        [pygame.transform.rotate(image, 270) for image in images],        # 3: down
+    ]
+
+
+class AssetRegistry:  # loads every image once and hands out the same surfaces for the rest of the run
+    def __init__(self):
+        self.images: dict[str, pygame.Surface] = {}
+        self.load_time = 0.0  # seconds spent loading and converting
+        self.player: list[pygame.Surface] = []
+        self.player_frames: list[list[pygame.Surface]] = [[], [], [], []]
+        self.ghosts: list[pygame.Surface] = []
+        self.grid: dict[int, pygame.Surface] = {}
+        self.shrunk_images: dict[pygame.Surface, pygame.Surface] = {}  # smaller copies for boards drawn small
+        self.shrunk_scale = 1.0
+
+    def load(self, relative_path, colorkey=None):
+        if relative_path in self.images:  # already loaded, reuse the surface
+            return self.images[relative_path]
+
+        start = time.perf_counter()
+        image = pygame.image.load(resource_path(relative_path))
+        # converting to the display format makes every later blit cheaper, but needs a window to exist
+        if pygame.display.get_init() and pygame.display.get_surface() is not None:
+            image = image.convert_alpha() if image.get_alpha() is not None else image.convert()
+        if colorkey is not None:
+            image.set_colorkey(colorkey)
+        self.load_time += time.perf_counter() - start
+
+        self.images[relative_path] = image
+        return image
+
+    def loadAll(self):  # loads the sprites used by the grid, the player and the ghosts
+        self.grid = {i: self.load(f'assets/grid/{i}.png') for i in range(3)}
+        self.player = [self.load(f'assets/john/{i}.png', PLAYER_COLORKEY) for i in range(1, 4)]
+        self.player_frames = directionalFrames(self.player)  # flipped and rotated once instead of every frame
+        self.ghosts = [self.load(f'assets/ghosts/{i}.png', GHOST_COLORKEY) for i in range(1, 7)]
+        return self
+
+    def shrunk(self, image, scale):  # a copy of the image at scale, kept until a board needs another scale
+        if scale != self.shrunk_scale:
+            self.shrunk_images.clear()
+            self.shrunk_scale = scale
+        copy = self.shrunk_images.get(image)
+        if copy is None:
+            size = (max(1, round(image.get_width() * scale)), max(1, round(image.get_height() * scale)))
+            copy = self.shrunk_images[image] = pygame.transform.scale(image, size)
+        return copy
+
+    def memoryUsage(self):  # bytes of pixel data held by the loaded surfaces
+        return sum(image.get_pitch() * image.get_height() for image in self.images.values())
+
+    def report(self):
+        return (f'Loaded {len(self.images)} images in {self.load_time * 1000:.1f} ms '
+                f'using {self.memoryUsage() / 1024:.1f} KiB')
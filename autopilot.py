@@ -0,0 +1,178 @@
+import argparse
+import time
+from array import array
+from collections import deque
+import pygame
+import main
+from maze import DIRECTION_BITS
+from pathfinding import UNREACHABLE, stepFrom
+from simulation import Simulation
+
+# plays the game by trying moves out on copies of it. Each time the player reaches a new tile the game is
+# snapshotted, every move from there is played forward with the real rules (ghosts included) until the player
+# reaches the next tile, and the best few lines of play (the beam) are extended again until time runs out.
+
+BUDGET_SECONDS = 0.006  # per decision, decisions only happen once per tile so most of a 60 fps frame is left
+BEAM_WIDTH = 4
+MAX_DEPTH = 16          # moves ahead
+LIFE_VALUE = 1000
+LEVEL_VALUE = 5000
+PELLET_PULL = 0.5       # per tile from the nearest pellet, so the bot heads for pellets beyond the search
+GHOST_DANGER = 30       # per tile closer than 4 to a ghost that can still catch the player
+
+
+class Autopilot:
+    def __init__(self, budget=BUDGET_SECONDS, beam_width=BEAM_WIDTH, max_depth=MAX_DEPTH):
+        self.budget = budget
+        self.beam_width = beam_width
+        self.max_depth = max_depth
+        self.direction = 0
+        self.decided_for = None    # the player's tile, lives and level when the current direction was picked
+        self.pellet_field = None   # tiles from every cell to the nearest pellet, see pelletDistances()
+        self.pellet_key = None
+        self.nodes = 0             # moves simulated, for the benchmark
+        self.decisions = 0
+        self.search_time = 0.0
+        self.slowest = 0.0
+
+    def steer(self):  # the direction_command for this tick, searched again whenever the player reaches a new tile
+        player = main.player
+        key = (player.readRow(), player.readCol(), player.lives, main.levels_cleared)
+        if key != self.decided_for:
+            self.direction = self.decide()
+            self.decided_for = key
+        return self.direction
+
+    def decide(self):
+        start = time.perf_counter()
+        deadline = start + self.budget
+        root = main.GameState.snapshot()
+        display = self.detachDisplay()
+        pellet_field = self.pelletDistances()
+
+        beam = [(0.0, None, root)]
+        best = None
+        for _ in range(self.max_depth):
+            children = []
+            for _, first_move, state in beam:
+                for direction in self.moves(state):
+                    state.restore()
+                    lives = main.player.lives
+                    self.expand(direction)
+                    self.nodes += 1
+                    alive = main.running and main.player.lives == lives
+                    children.append((self.evaluate(pellet_field), direction if first_move is None else first_move,
+                                     main.GameState.snapshot() if alive else None))
+                    if time.perf_counter() > deadline:
+                        break
+                else:
+                    continue
+                break
+            else:  # a whole level of the tree was searched, so its values are fair to compare
+                if children:
+                    best = max(children, key=lambda child: child[0])[1]
+                beam = sorted((child for child in children if child[2] is not None), key=lambda child: -child[0])
+                beam = beam[:self.beam_width]
+                if beam:
+                    continue
+            if best is None and children:
+                best = max(children, key=lambda child: child[0])[1]
+            break
+
+        root.restore()
+        self.attachDisplay(display)
+        elapsed = time.perf_counter() - start
+        self.decisions += 1
+        self.search_time += elapsed
+        self.slowest = max(self.slowest, elapsed)
+        return self.direction if best is None else best
+
+    def moves(self, state):  # directions the player can take from the tile it is on in the given state
+        state.restore()
+        mask = main.currentMaze().readMask(main.player.readRow(), main.player.readCol())
+        return [direction for direction in range(4) if mask & DIRECTION_BITS[direction]]
+
+    def expand(self, direction):  # plays the game on until the player has moved a tile, or been caught
+        player = main.player
+        player.direction_command = direction
+        row, col, lives = player.readRow(), player.readCol(), player.lives
+        for _ in range(player.player_speed + 1):
+            main.update()
+            if player.readRow() != row or player.readCol() != col or player.lives != lives or not main.running:
+                break
+
+    def evaluate(self, pellet_field):
+        player = main.player
+        row, col = player.readRow(), player.readCol()
+        value = player.points + LIFE_VALUE * player.lives + LEVEL_VALUE * main.levels_cleared
+        distance = pellet_field[row * main.currentMaze().cols + col]
+        if distance != UNREACHABLE:
+            value -= PELLET_PULL * distance
+        for ghost in main.ghosts:
+            if ghost.mortality or (player.power and not ghost.eaten):
+                continue  # dead or frightened ghosts can't catch the player
+            distance = abs(ghost.readRow() - row) + abs(ghost.readCol() - col)
+            if distance < 4:
+                value -= GHOST_DANGER * (4 - distance)
+        return value
+
+    def pelletDistances(self):  # breadth-first from every pellet at once, only redone when a pellet is eaten
+        key = (id(main.level), main.remainingPellets())
+        if key == self.pellet_key:
+            return self.pellet_field
+        maze, level = main.currentMaze(), main.level
+        rows, cols = maze.rows, maze.cols
+        field = array('H', [UNREACHABLE]) * (rows * cols)
+        queue = deque()
+        for row in range(rows):
+            for col in range(cols):
+                if level[row][col] in (1, 2):
+                    field[row * cols + col] = 0
+                    queue.append(row * cols + col)
+        while queue:  # moves between open tiles always work both ways, so distances from pellets are distances to them
+            cell = queue.popleft()
+            row, col = divmod(cell, cols)
+            for direction in range(4):
+                if maze.turn_masks[cell] & DIRECTION_BITS[direction]:
+                    next_row, next_col = stepFrom(row, col, direction, rows, cols)
+                    next_cell = next_row * cols + next_col
+                    if field[next_cell] == UNREACHABLE:
+                        field[next_cell] = field[cell] + 1
+                        queue.append(next_cell)
+        self.pellet_field, self.pellet_key = field, key
+        return field
+
+    def detachDisplay(self):  # keeps the search from drawing on the board layers, retitling the window or
+        # being timed by the profiler, whose update() phases and tick count are only for the real game
+        display = (main.maze_surface, main.pellet_surface, pygame.display.get_caption(), main.profiler)
+        main.pellet_surface = None
+        main.profiler = None
+        return display
+
+    def attachDisplay(self, display):
+        main.maze_surface, main.pellet_surface, caption, main.profiler = display
+        if caption:
+            pygame.display.set_caption(caption[0])
+
+    def report(self):
+        if not self.decisions:
+            return 'no decisions made'
+        return (f'{self.nodes} nodes in {self.decisions} decisions, {self.nodes / self.search_time:.0f} nodes/s, '
+                f'{self.search_time / self.decisions * 1000:.2f} ms mean and {self.slowest * 1000:.2f} ms slowest per decision')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play headless John-Man games with the autopilot and time its search.')
+    parser.add_argument('--games', type=int, default=3)
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--max-ticks', type=int, default=10000)
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_SECONDS * 1000)
+    parser.add_argument('--beam-width', type=int, default=BEAM_WIDTH)
+    args = parser.parse_args()
+
+    pilot = Autopilot(args.budget_ms / 1000, args.beam_width)
+    for seed in range(args.first_seed, args.first_seed + args.games):
+        simulation = Simulation(seed=seed)
+        results = simulation.run(args.max_ticks, lambda simulation: pilot.steer())
+        print(f'seed {seed}: {results}')
+    print(pilot.report())
@@ -0,0 +1,365 @@
+import argparse
+import time
+import numpy as np
+from levels import builtinPack, choosePack
+from maze import Maze
+from pathfinding import AllPairsTable, tableForMaze
+
+# the same rules as Player and Ghost in main.py, applied to many games at once. Every game is a row in a set
+# of arrays and each phase of main.update() runs as a few array operations over all of them, so the games
+# advance in lockstep. The random numbers come from NumPy, so a batch game follows the same rules as a
+# main.py game but not the same random choices.
+
+PATHFINDING_MODES = ('manhattan', 'table')  # main.py's breadth-first search has no batch version
+RANDOMNESS = np.array([0.05, 0.15, 0.25, 0.35])  # chance per character of a random move when deciding
+CONTINUE_STRAIGHT = 0.7 - np.arange(4) * 0.2     # chance per character of keeping its direction when random
+POWER_TICKS = 600
+MIN_SPEED = 3
+
+ROW_STEP = np.array([0, 0, -1, 1])  # right, left, up, down
+COL_STEP = np.array([1, -1, 0, 0])
+POPCOUNT = np.array([bin(mask).count('1') for mask in range(16)])
+# NTH_TURN[mask, n] is the n-th allowed direction of a turn mask, for picking a random allowed direction
+NTH_TURN = np.array([[([d for d in range(4) if mask >> d & 1] + [0, 0, 0, 0])[n] for n in range(4)] for mask in range(16)])
+
+
+class BatchSimulator:
+    def __init__(self, games, player_speed=7, ghost_speed=8, seed=None, pack=None, ghost_count=4,
+                 pathfinding='manhattan'):  # pack is a levels.py compiled pack, the classic board if left out
+        pack = builtinPack() if pack is None else pack
+        if len(pack) != 1:  # every game would need its own board size once they cleared different numbers of levels
+            raise ValueError(f'the batch simulator plays a pack of one board, not {len(pack)}')
+        if pathfinding not in PATHFINDING_MODES:
+            raise ValueError(f"the batch simulator's ghost pathfinding is one of {', '.join(PATHFINDING_MODES)}, "
+                             f'not {pathfinding!r}')
+        board = pack[0]
+        # like main.py, ghost i is character i % 4 and starts in, and flees to, that character's corner
+        self.ghost_count = ghost_count
+        self.characters = np.arange(ghost_count) % 4
+        spawns = board.ghost_spawns
+        self.player_start = tuple(board.player_spawn)
+        self.ghost_corners = np.array([spawns[character % len(spawns)] for character in self.characters],
+                                      dtype=np.int32).reshape(ghost_count, 2)
+        self.clyde_corner = tuple(spawns[2 % len(spawns)])  # Inky's corner is where Clyde retreats to when close
+        maze = Maze(board.toLevel())
+        self.rows, self.cols = maze.rows, maze.cols
+        self.masks = np.frombuffer(bytes(maze.turn_masks), dtype=np.uint8).astype(np.int32)
+        self.start_tiles = np.frombuffer(bytes(board.tiles), dtype=np.uint8).copy()
+        # row, column and the cell one move away in each direction for every cell, wrapping like the game does
+        self.cell_row, self.cell_col = np.divmod(np.arange(self.rows * self.cols, dtype=np.int32), self.cols)
+        self.next_cell = np.stack([np.clip(self.cell_row + ROW_STEP[direction], 0, self.rows - 1) * self.cols
+                                   + (self.cell_col + COL_STEP[direction]) % self.cols for direction in range(4)]).astype(np.int32)
+        self.start_pellets = int(np.count_nonzero((self.start_tiles == 1) | (self.start_tiles == 2)))
+        self.games = games
+        self.start_player_speed = player_speed
+        self.start_ghost_speed = ghost_speed
+        self.rng = np.random.default_rng(seed)
+        self.pathfinding = pathfinding
+        if pathfinding == 'table':  # maze distances between every pair of tiles, see pathfinding.AllPairsTable
+            table = tableForMaze(maze)
+            if not isinstance(table, AllPairsTable):
+                raise ValueError(f'a {self.rows}x{self.cols} board is too big for an all-pairs table, '
+                                 "use 'manhattan' pathfinding in the batch simulator")
+            self.nodes = np.frombuffer(table.nodes.tobytes(), dtype=np.int32)
+            self.nearest = np.frombuffer(table.nearest.tobytes(), dtype=np.int32)
+            self.distances = np.frombuffer(table.distances.tobytes(), dtype=np.uint16).reshape(table.size, table.size)
+        self.reset()
+
+    def reset(self):
+        n = self.games
+        self.counter = 0  # every game starts together, so they all share the ghost timing counter
+        self.tiles = np.empty((n, self.start_tiles.size), dtype=np.uint8)
+        self.pellets = np.empty(n, dtype=np.int32)
+        self.running = np.empty(n, dtype=bool)
+        self.ticks = np.empty(n, dtype=np.int32)  # ticks each game has been running for
+        self.levels_cleared = np.empty(n, dtype=np.int32)
+        self.relocated = np.empty(n, dtype=bool)  # player put back at the start since the last pellet check
+
+        self.player_row = np.empty(n, dtype=np.int32)
+        self.player_col = np.empty(n, dtype=np.int32)
+        self.direction = np.empty(n, dtype=np.int32)
+        self.direction_command = np.empty(n, dtype=np.int32)
+        self.move_counter = np.empty(n, dtype=np.int32)
+        self.player_speed = np.empty(n, dtype=np.int32)
+        self.points = np.empty(n, dtype=np.int32)
+        self.power = np.empty(n, dtype=bool)
+        self.power_counter = np.empty(n, dtype=np.int32)
+        self.lives = np.empty(n, dtype=np.int32)
+
+        # ghost fields are [ghost, game] so each ghost's values for every game sit next to each other
+        ghosts = self.ghost_count
+        self.eaten_ghosts = np.empty((ghosts, n), dtype=bool)
+        self.ghost_row = np.empty((ghosts, n), dtype=np.int32)
+        self.ghost_col = np.empty((ghosts, n), dtype=np.int32)
+        self.ghost_direction = np.empty((ghosts, n), dtype=np.int32)
+        self.ghost_move_counter = np.empty((ghosts, n), dtype=np.int32)
+        self.ghost_speed = np.empty(n, dtype=np.int32)
+        self.mortality = np.empty((ghosts, n), dtype=bool)
+        self.resetGames(np.ones(n, dtype=bool))
+
+    def resetGames(self, games):  # starts the chosen games again from scratch, the others carry on
+        self.tiles[games] = self.start_tiles
+        self.pellets[games] = self.start_pellets
+        self.running[games] = True
+        self.ticks[games] = 0
+        self.levels_cleared[games] = 0
+        self.relocated[games] = False
+
+        self.player_row[games] = self.player_start[0]
+        self.player_col[games] = self.player_start[1]
+        self.direction[games] = 0
+        self.direction_command[games] = 0
+        self.move_counter[games] = 0
+        self.player_speed[games] = self.start_player_speed
+        self.points[games] = 0
+        self.power[games] = False
+        self.power_counter[games] = 0
+        self.lives[games] = 3
+
+        self.eaten_ghosts[:, games] = False
+        self.ghost_row[:, games] = self.ghost_corners[:, 0:1]
+        self.ghost_col[:, games] = self.ghost_corners[:, 1:2]
+        self.ghost_direction[:, games] = 0
+        self.ghost_move_counter[:, games] = 0
+        self.ghost_speed[games] = self.start_ghost_speed
+        self.mortality[:, games] = False
+
+    def step(self, direction_commands=None):  # one tick of every game; commands of -1 leave a game's input alone
+        if direction_commands is not None:
+            direction_commands = np.asarray(direction_commands)
+            np.copyto(self.direction_command, direction_commands, where=direction_commands >= 0)
+
+        active = self.running.copy()
+        self.ticks += active
+        self.counter = self.counter + 1 if self.counter < 15 else 0
+        moved = self.movePlayer(active)
+        self.checkCollisions(active & (moved | self.relocated))
+        self.powerUp(active)
+        self.checkGhostCollisions(active)
+        self.checkLevelComplete(active)
+        for ghost in range(self.ghost_count):
+            if self.counter % (4 + self.characters[ghost]) == 0:  # different timing for each ghost character
+                self.findPath(ghost, active)
+            self.moveGhost(ghost, active)
+        return self.running
+
+    def run(self, ticks, policy=None):  # policy(simulator) returns an array of commands or None each tick
+        for _ in range(ticks):
+            if not self.running.any():
+                break
+            self.step(policy(self) if policy else None)
+        return self.results()
+
+    def movePlayer(self, active):  # returns which games' players moved a tile
+        turns = self.masks[self.player_row * self.cols + self.player_col]
+        turn_ok = active & ((turns >> self.direction_command) & 1).astype(bool)
+        np.copyto(self.direction, self.direction_command, where=turn_ok)
+        self.move_counter += active
+        moving = active & (self.move_counter >= self.player_speed)
+        if not moving.any():  # players only move every few ticks, and usually all on the same tick
+            return moving
+        self.move_counter[moving] = 0
+        moving &= ((turns >> self.direction) & 1).astype(bool)
+        np.copyto(self.player_row, np.clip(self.player_row + ROW_STEP[self.direction], 0, self.rows - 1), where=moving)
+        np.copyto(self.player_col, (self.player_col + COL_STEP[self.direction]) % self.cols, where=moving)
+        return moving
+
+    def checkCollisions(self, checking):  # only players that arrived on a new tile can be standing on a pellet
+        if not checking.any():
+            return
+        self.relocated[checking] = False
+        games = np.flatnonzero(checking)
+        cells = self.player_row[games] * self.cols + self.player_col[games]
+        tile = self.tiles[games, cells]
+        dot = tile == 1
+        big_dot = tile == 2
+        eaten = dot | big_dot
+        self.tiles[games[eaten], cells[eaten]] = 0
+        self.pellets[games] -= eaten
+        self.points[games] += dot + 10 * big_dot
+        self.power[games[big_dot]] = True
+        self.power_counter[games[big_dot]] = 0
+
+    def powerUp(self, active):
+        powered = active & self.power
+        if not powered.any():
+            return
+        expired = powered & (self.power_counter >= POWER_TICKS)
+        self.power_counter += powered & ~expired
+        self.power_counter[expired] = 0
+        self.power &= ~expired
+        self.mortality &= ~(expired & self.eaten_ghosts)  # eaten ghosts come back to life
+        self.eaten_ghosts &= ~expired
+
+    def checkGhostCollisions(self, active):
+        # the 36 pixel collision rects of tiles 28 pixels apart overlap exactly when they are neighbours
+        touching = ((np.abs(self.ghost_row - self.player_row) <= 1) & (np.abs(self.ghost_col - self.player_col) <= 1)).any(axis=0)
+        if not (touching & active).any():
+            return
+        for ghost in range(self.ghost_count):  # one at a time, a lost life moves the player before the next is checked
+            touching = (active & (np.abs(self.ghost_row[ghost] - self.player_row) <= 1)
+                        & (np.abs(self.ghost_col[ghost] - self.player_col) <= 1))
+            eats_ghost = touching & self.power & ~self.eaten_ghosts[ghost]
+            self.eaten_ghosts[ghost] |= eats_ghost
+            self.points += 100 * eats_ghost
+            self.mortality[ghost] |= eats_ghost
+            self.ghost_row[ghost, eats_ghost] = self.ghost_corners[ghost, 0]
+            self.ghost_col[ghost, eats_ghost] = self.ghost_corners[ghost, 1]
+
+            caught = touching & ~self.power & ~self.mortality[ghost]
+            self.lives -= caught
+            respawn = caught & (self.lives > 0)
+            self.player_row[respawn] = self.player_start[0]
+            self.player_col[respawn] = self.player_start[1]
+            self.direction[respawn] = 0
+            self.direction_command[respawn] = 0
+            self.relocated |= respawn
+            self.running &= ~(caught & (self.lives <= 0))
+
+    def checkLevelComplete(self, active):
+        complete = active & (self.pellets == 0)
+        if not complete.any():
+            return
+        self.levels_cleared += complete
+        self.lives += complete
+        # reset_level()
+        self.tiles[complete] = self.start_tiles
+        self.pellets[complete] = self.start_pellets
+        self.ghost_row[:, complete] = self.ghost_corners[:, 0:1]
+        self.ghost_col[:, complete] = self.ghost_corners[:, 1:2]
+        self.mortality[:, complete] = False
+        self.player_row[complete] = self.player_start[0]
+        self.player_col[complete] = self.player_start[1]
+        self.direction[complete] = 0
+        self.direction_command[complete] = 0
+        self.power[complete] = False
+        self.power_counter[complete] = 0
+        self.eaten_ghosts[:, complete] = False
+        self.relocated |= complete
+        # increase_speed()
+        self.player_speed[complete] = np.maximum(MIN_SPEED, self.player_speed[complete] - 1)
+        self.ghost_speed[complete] = np.maximum(MIN_SPEED, self.ghost_speed[complete] - 1)
+
+    def findTarget(self, ghost):  # the tile each game's ghost is heading for, like the start of Ghost.findPath
+        player_row, player_col = self.player_row, self.player_col
+        character = self.characters[ghost]
+        if character == 0:  # Blinky chases the player directly
+            return player_row, player_col
+        if character == 1:  # Pinky aims 4 tiles ahead of the player
+            target_row = np.clip(player_row + 4 * ROW_STEP[self.direction], 0, self.rows - 1)
+            target_col = (player_col + 4 * COL_STEP[self.direction]) % self.cols
+            return target_row, target_col
+        if character == 2:  # Inky doubles the vector from the first Blinky to the player
+            target_row = np.clip(2 * player_row - self.ghost_row[0], 0, self.rows - 1)
+            target_col = np.clip(2 * player_col - self.ghost_col[0], 0, self.cols - 1)
+            return target_row, target_col
+        # Clyde chases when far away and retreats to his corner when close
+        close = self.distance(self.ghost_row[ghost], self.ghost_col[ghost], player_row, player_col) < 8
+        return np.where(close, self.clyde_corner[0], player_row), np.where(close, self.clyde_corner[1], player_col)
+
+    def distance(self, row, col, target_row, target_col):
+        if self.pathfinding == 'table':
+            target = self.nodes[self.nearest[np.clip(target_row, 0, self.rows - 1) * self.cols + np.clip(target_col, 0, self.cols - 1)]]
+            return self.distances[self.nodes[row * self.cols + col], target].astype(np.int32)
+        return np.abs(target_row - row) + np.abs(target_col - col)
+
+    def findPath(self, ghost, deciding):
+        cells = self.ghost_row[ghost] * self.cols + self.ghost_col[ghost]
+        turns = self.masks[cells]
+        target_row, target_col = self.findTarget(ghost)
+
+        fleeing = self.power & ~self.eaten_ghosts[ghost]
+        target_row = np.where(fleeing, self.ghost_corners[ghost, 0], target_row)
+        target_col = np.where(fleeing, self.ghost_corners[ghost, 1], target_col)
+        random_move = deciding & (self.rng.random(self.games, dtype=np.float32) < RANDOMNESS[self.characters[ghost]] + 0.2 * fleeing)
+
+        if self.pathfinding == 'table':  # maze distances lead a fleeing ghost home to its corner
+            target = self.nodes[self.nearest[target_row * self.cols + target_col]]
+            sign = 1
+        else:  # like Ghost.findPath, fleeing ghosts maximise straight-line distance to their corner
+            sign = 1 - 2 * fleeing.astype(np.int32)
+        # the allowed direction whose next tile scores lowest, the first one on a tie like Ghost.findPath
+        best = np.full(self.games, -1, dtype=np.int32)
+        best_score = np.full(self.games, np.iinfo(np.int32).max, dtype=np.int32)
+        for direction in range(4):
+            next_cells = self.next_cell[direction, cells]
+            if self.pathfinding == 'table':
+                score = self.distances[self.nodes[next_cells], target].astype(np.int32)
+            else:
+                score = sign * (np.abs(target_row - self.cell_row[next_cells]) + np.abs(target_col - self.cell_col[next_cells]))
+            better = ((turns >> direction) & 1).astype(bool) & (score < best_score)
+            np.copyto(best, direction, where=better)
+            np.copyto(best_score, score, where=better)
+
+        stuck = best < 0
+        np.copyto(self.ghost_direction[ghost], best, where=deciding & ~random_move & ~stuck)
+        self.findRandomDirection(ghost, deciding & (random_move | stuck))
+
+    def findRandomDirection(self, ghost, picking):
+        if not picking.any():
+            return
+        row, col = self.ghost_row[ghost], self.ghost_col[ghost]
+        turns = self.masks[row * self.cols + col]
+        direction = self.ghost_direction[ghost]
+
+        stuck = picking & (turns == 0)  # shouldn't happen, put the ghost back in its corner
+        row[stuck] = self.ghost_corners[ghost, 0]
+        col[stuck] = self.ghost_corners[ghost, 1]
+
+        keep = ((turns >> direction) & 1).astype(bool) & (self.rng.random(self.games, dtype=np.float32) < CONTINUE_STRAIGHT[self.characters[ghost]])
+        nth = np.minimum((self.rng.random(self.games, dtype=np.float32) * POPCOUNT[turns]).astype(np.int32), 3)
+        np.copyto(direction, NTH_TURN[turns, nth], where=picking & ~stuck & ~keep, casting='unsafe')
+
+    def moveGhost(self, ghost, active):
+        move_counter = self.ghost_move_counter[ghost]
+        move_counter += active
+        moving = active & (move_counter >= self.ghost_speed)
+        if not moving.any():  # ghosts only move every few ticks, and usually all on the same tick
+            return
+        move_counter[moving] = 0
+        row, col, direction = self.ghost_row[ghost], self.ghost_col[ghost], self.ghost_direction[ghost]
+        turns = self.masks[row * self.cols + col]
+        blocked = moving & ~((turns >> direction) & 1).astype(bool)
+        moving &= ~blocked
+        np.copyto(row, np.clip(row + ROW_STEP[direction], 0, self.rows - 1), where=moving, casting='unsafe')
+        np.copyto(col, (col + COL_STEP[direction]) % self.cols, where=moving, casting='unsafe')
+        self.findRandomDirection(ghost, blocked)
+
+    def results(self):
+        return {
+            'score': self.points.copy(),
+            'levels_cleared': self.levels_cleared.copy(),
+            'lives_lost': self.levels_cleared + 3 - self.lives,
+            'ticks': self.ticks.copy(),
+        }
+
+
+def randomPolicy(simulator):  # a new random direction for each game every 30 ticks
+    commands = simulator.rng.integers(0, 4, simulator.games)
+    return np.where(simulator.ticks % 30 == 0, commands, -1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run many headless John-Man games in lockstep and time them.')
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--ticks', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--player-speed', type=int, default=7)
+    parser.add_argument('--ghost-speed', type=int, default=8)
+    parser.add_argument('--pathfinding', choices=PATHFINDING_MODES, default='manhattan')
+    parser.add_argument('--ghosts', type=int, default=4)
+    parser.add_argument('--levels', help='a level pack of one board, see levels.py')
+    parser.add_argument('--arena', help='a generated arena board, like 64x64')
+    args = parser.parse_args()
+
+    pack = choosePack(args.levels, args.arena)
+    simulator = BatchSimulator(args.games, args.player_speed, args.ghost_speed, args.seed, pack, args.ghosts,
+                               args.pathfinding)
+    start = time.perf_counter()
+    results = simulator.run(args.ticks, randomPolicy)
+    elapsed = time.perf_counter() - start
+    game_ticks = int(results['ticks'].sum())
+    print(f'{args.games} games, {game_ticks} game-ticks in {elapsed:.2f} s '
+          f'({game_ticks / elapsed / 1000:.0f} game-ticks per ms)')
+    print(f'mean score {results["score"].mean():.1f}, mean ticks survived {results["ticks"].mean():.0f}, '
+          f'levels cleared {int(results["levels_cleared"].sum())}')
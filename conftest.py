@@ -0,0 +1,39 @@
+from array import array
+import pytest
+import main
+
+
+def saveContents(value):  # what's in a list or array, keeping the lists inside a list as the same objects
+    if isinstance(value, list):
+        return [(item, saveContents(item)) for item in value]
+    if isinstance(value, (array, bytearray)):
+        return value[:]
+    return None
+
+
+def restoreContents(value, contents):
+    if contents is None:
+        return
+    if isinstance(value, list):
+        value[:] = [item for item, _ in contents]
+        for item, inner in contents:
+            restoreContents(item, inner)
+    else:
+        value[:] = contents
+
+
+# main keeps the game in module globals, so a test that starts a new game, seeds the ghosts, eats pellets or
+# swaps the level would leave them changed for every test after it. Tests that take this fixture get main back
+# the way it was: every global, the contents of the lists and arrays among them (the level's rows included),
+# and the player's and ghosts' positions and state through a GameState snapshot.
+@pytest.fixture
+def game_globals():
+    state = main.GameState.snapshot()
+    saved = {name: value for name, value in vars(main).items() if not name.startswith('__')}
+    contents = {name: saveContents(value) for name, value in saved.items()}
+    yield
+    for name, value in saved.items():
+        setattr(main, name, value)
+    for name, value in saved.items():
+        restoreContents(value, contents[name])
+    state.restore()
@@ -0,0 +1,24 @@
+# the per-entity fields an EntityStore keeps a column of
+FIELDS = ('row', 'col', 'x_pos', 'y_pos', 'previous_row', 'previous_col', 'direction', 'move_counter', 'speed',
+          'mortality', 'eaten')
+
+
+class EntityStore:  # one column per field, entity i's values are element i of each of them
+    # the columns are lists rather than typed arrays, CPython reads and writes list elements several times faster
+    __slots__ = ('size',) + FIELDS
+
+    def __init__(self, size):
+        self.size = size
+        for field in FIELDS:
+            setattr(self, field, [0] * size)
+
+
+def view(field, changed=None):  # a property reading and writing the entity's element of one store column
+    def read(self):
+        return getattr(self.store, field)[self.slot]
+
+    def write(self, value):
+        getattr(self.store, field)[self.slot] = value
+        if changed is not None:
+            changed(self)
+    return property(read, write)
@@ -0,0 +1,153 @@
+import time
+import numpy as np
+import main
+from batch import BatchSimulator
+from simulation import Simulation
+
+# reset()/step() environments for training agents on the game without a window. Observations are
+# [channel, row, col] arrays with one 0/1 layer for each of the channels below, rewards are the points scored
+# during the step and an episode is done once the player has no lives left.
+CHANNELS = ('walls', 'pellets', 'power pellets', 'ghosts', 'frightened ghosts', 'player')
+WALLS, PELLETS, POWER_PELLETS, GHOSTS, FRIGHTENED_GHOSTS, PLAYER = range(len(CHANNELS))
+
+_active = None  # the GameEnv whose game is currently in main's globals
+
+
+class GameEnv:  # one game, played with the rules in main.py
+    def __init__(self, seed=None, player_speed=7, ghost_speed=8, ticks_per_step=1, pack=None, ghost_count=None,
+                 pathfinding=None):  # the last three are main.newGame()'s, left out they're whatever main has now
+        self.seed = seed
+        self.player_speed = player_speed
+        self.ghost_speed = ghost_speed
+        self.ticks_per_step = ticks_per_step
+        self.settings = (pack, ghost_count, pathfinding)
+        self.simulation = None
+        self.state = None  # this game while another GameEnv has main's globals
+        self.board = None  # walls and pellets of the current level, kept up to date from main.eatenCells()
+        self.board_level = None
+        self.board_eaten = 0
+
+    def activate(self):  # several environments can share one process by swapping their games in and out
+        global _active
+        if _active is not self:
+            if _active is not None:
+                _active.state = main.GameState.snapshot()
+            if self.state is not None:
+                main.level_pack, main.number_of_ghosts, main.ghost_pathfinding = self.settings
+                self.state.restore()
+            _active = self
+
+    def reset(self, seed=None):
+        global _active
+        if seed is not None:
+            self.seed = seed
+        if _active is not None and _active is not self:
+            _active.state = main.GameState.snapshot()
+        _active = self
+        self.state = None
+        self.simulation = Simulation(self.player_speed, self.ghost_speed, self.seed, *self.settings)
+        self.settings = (main.level_pack, main.number_of_ghosts, main.ghost_pathfinding)  # kept for activate()
+        if self.seed is not None:
+            self.seed += 1  # the next episode plays differently but just as repeatably
+        return self.observe()
+
+    def step(self, action):  # action is a direction 0-3, or None to keep the last one
+        self.activate()
+        points = main.player.points
+        for _ in range(self.ticks_per_step):
+            if not self.simulation.step(action):
+                break
+            action = None
+        reward = main.player.points - points
+        done = not main.running
+        return self.observe(), reward, done, {'lives': main.player.lives, 'ticks': self.simulation.ticks}
+
+    def observe(self):
+        level = main.level
+        if self.board_level is not level:  # a new level, lay its tiles out again
+            self.board = np.array(level, dtype=np.uint8)
+            self.board_level = level
+            self.board_eaten = 0
+        eaten = main.eatenCells()
+        if len(eaten) < self.board_eaten:  # a GameState restore went back in time
+            self.board = np.array(level, dtype=np.uint8)
+        elif len(eaten) > self.board_eaten:
+            self.board.reshape(-1)[np.frombuffer(eaten, dtype=np.uint32)[self.board_eaten:]] = 0
+        self.board_eaten = len(eaten)
+
+        observation = np.zeros((len(CHANNELS),) + self.board.shape, dtype=np.uint8)
+        observation[WALLS] = self.board >= 3
+        observation[PELLETS] = self.board == 1
+        observation[POWER_PELLETS] = self.board == 2
+        player = main.player
+        for ghost in main.ghosts:
+            frightened = ghost.mortality or (player.power and not ghost.eaten)
+            observation[FRIGHTENED_GHOSTS if frightened else GHOSTS, ghost.readRow(), ghost.readCol()] = 1
+        observation[PLAYER, player.readRow(), player.readCol()] = 1
+        return observation
+
+
+class BatchEnv:  # many games stepped together on batch.BatchSimulator, finished games start again by themselves
+    def __init__(self, envs, seed=None, player_speed=7, ghost_speed=8, ticks_per_step=1, pack=None, ghost_count=None,
+                 pathfinding=None):  # like GameEnv's, left out they're the settings main has now
+        pack = main.level_pack if pack is None else pack
+        ghost_count = main.number_of_ghosts if ghost_count is None else ghost_count
+        pathfinding = main.ghost_pathfinding if pathfinding is None else pathfinding
+        self.simulator = BatchSimulator(envs, player_speed, ghost_speed, seed, pack, ghost_count, pathfinding)
+        self.envs = envs
+        self.ticks_per_step = ticks_per_step
+        rows, cols = self.simulator.rows, self.simulator.cols
+        self.walls = (self.simulator.start_tiles >= 3).reshape(rows, cols)
+        self.games = np.arange(envs)
+
+    def reset(self):
+        self.simulator.reset()
+        return self.observe()
+
+    def step(self, actions):  # actions is one direction 0-3 per game, or -1 to keep the last one
+        simulator = self.simulator
+        points = simulator.points.copy()
+        actions = np.asarray(actions)
+        for _ in range(self.ticks_per_step):
+            simulator.step(actions)
+            actions = None
+        rewards = simulator.points - points
+        dones = ~simulator.running
+        infos = {'score': simulator.points.copy(), 'ticks': simulator.ticks.copy()}  # before finished games restart
+        if dones.any():
+            simulator.resetGames(dones)
+        return self.observe(), rewards, dones, infos
+
+    def observe(self):
+        simulator = self.simulator
+        rows, cols = simulator.rows, simulator.cols
+        tiles = simulator.tiles.reshape(self.envs, rows, cols)
+        observation = np.zeros((self.envs, len(CHANNELS), rows, cols), dtype=np.uint8)
+        observation[:, WALLS] = self.walls
+        observation[:, PELLETS] = tiles == 1
+        observation[:, POWER_PELLETS] = tiles == 2
+        for ghost in range(simulator.ghost_count):
+            frightened = simulator.mortality[ghost] | (simulator.power & ~simulator.eaten_ghosts[ghost])
+            channel = np.where(frightened, FRIGHTENED_GHOSTS, GHOSTS)
+            observation[self.games, channel, simulator.ghost_row[ghost], simulator.ghost_col[ghost]] = 1
+        observation[self.games, PLAYER, simulator.player_row, simulator.player_col] = 1
+        return observation
+
+
+if __name__ == '__main__':  # steps per second with random actions, one game and a batch
+    rng = np.random.default_rng(0)
+    env = GameEnv(seed=0)
+    env.reset()
+    start = time.perf_counter()
+    for step in range(5000):
+        _, _, done, _ = env.step(int(rng.integers(4)) if step % 30 == 0 else None)
+        if done:
+            env.reset()
+    print(f'GameEnv: {5000 / (time.perf_counter() - start):.0f} steps/s')
+
+    batch = BatchEnv(1024, seed=0)
+    batch.reset()
+    start = time.perf_counter()
+    for step in range(500):
+        batch.step(rng.integers(0, 4, 1024) if step % 30 == 0 else np.full(1024, -1))
+    print(f'BatchEnv of 1024: {1024 * 500 / (time.perf_counter() - start):.0f} steps/s')
@@ -170,4 +170,22 @@ def test_inky_flanking_ai(game_setup):
     direction = inky.findPath(player.readRow(), player.readCol())
 
     # Assert: Inky moves left towards the calculated target point.
-    assert direction == 1  # 1 is Left
\ No newline at end of file
+    assert direction == 1  # 1 is Left
+
+def test_bfs_ghost_paths_around_walls(game_setup, monkeypatch):
+    """Grey-box test for the breadth-first ghost pathfinding mode.
+    A wall between Blinky and the player must be walked around, not pushed against."""
+    import main
+    player, ghosts, _ = game_setup
+    blinky = ghosts[0]
+    monkeypatch.setattr(main, 'ghost_pathfinding', 'bfs')
+
+    # Arrange: The player is just across the vertical wall in the middle of the top corridor.
+    set_pos(player, 2, 16)
+    set_pos(blinky, 2, 13)
+
+    # Act: Pathfind. The only way round is down to row 6 and back up.
+    direction = blinky.findPath(player.readRow(), player.readCol())
+
+    # Assert: Blinky heads down instead of left, away from the player.
+    assert direction == 3  # 3 is Down
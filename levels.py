@@ -0,0 +1,331 @@
+import hashlib
+import json
+import os
+import random
+import struct
+from collections import deque
+from maze import DIRECTION_BITS, Maze, isWalkable
+from pathfinding import stepFrom
+
+# a level pack is a list of boards, read from a text or JSON file, checked once and compiled to flat tiles with
+# their turn masks and pellet count worked out. Compiled packs are cached on disk under a hash of the file, so
+# loading the same pack again skips parsing and checking it.
+#
+# text packs hold one board after another, separated by blank lines. A board is a few optional "key: value"
+# lines followed by one line of tile digits (see board.py) per row, and lines starting with # are comments:
+#
+#     name: Classic
+#     player: 18 15
+#     ghosts: 2 2, 2 27, 30 2, 30 27
+#     644444444444444444444444444445
+#     ...
+#
+# JSON packs are {"boards": [{"name": ..., "tiles": [[...], ...], "player": [row, col], "ghosts": [[row, col], ...]}]}
+# where each row of tiles can also be a string of digits. Boards without spawns use the classic board's.
+
+PACK_MAGIC = b'JLVL1'  # start of a compiled pack cache file
+PACK_HEADER = struct.Struct('<H')              # number of boards
+BOARD_HEADER = struct.Struct('<HHHIHHH')       # name length, rows, cols, pellets, player row, player col, ghosts
+SPAWN = struct.Struct('<HH')                   # row, col of a ghost spawn
+DEFAULT_PLAYER_SPAWN = (18, 15)
+DEFAULT_GHOST_SPAWNS = ((2, 2), (2, 27), (30, 2), (30, 27))
+TILE_TYPES = 10  # tiles 0 to 9
+ARENA_LOOPS = 0.25  # share of the walls left inside a generated arena's maze that get knocked through as well
+
+
+class CompiledBoard:  # a checked board ready to play, everything that doesn't change while it is played
+    __slots__ = ('name', 'rows', 'cols', 'tiles', 'turn_masks', 'pellets', 'player_spawn', 'ghost_spawns')
+
+    def __init__(self, name, rows, cols, tiles, turn_masks, pellets, player_spawn, ghost_spawns):
+        self.name = name
+        self.rows = rows
+        self.cols = cols
+        self.tiles = tiles                # bytearray of rows * cols tiles, stored row by row
+        self.turn_masks = turn_masks      # bytearray, like Maze.turn_masks
+        self.pellets = pellets            # dots and big dots on the board
+        self.player_spawn = player_spawn  # (row, col)
+        self.ghost_spawns = ghost_spawns  # tuple of (row, col), one per ghost character
+
+    def toLevel(self):  # a fresh list of rows for a game to play on and eat the pellets from
+        cols = self.cols
+        return [list(self.tiles[start:start + cols]) for start in range(0, self.rows * cols, cols)]
+
+
+def parseText(text):  # the boards of a text pack, as the dicts parseJson() gives
+    boards = []
+    board = None
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if line.startswith('#'):
+            continue
+        if not line:
+            board = None  # the next line starts a new board
+            continue
+        if board is None:
+            board = {'name': f'board {len(boards) + 1}', 'tiles': []}
+            boards.append(board)
+        if ':' in line:
+            if board['tiles']:
+                raise ValueError(f'line {number}: "{line}" comes after the rows of tiles')
+            key, value = (part.strip() for part in line.split(':', 1))
+            try:
+                if key == 'name':
+                    board['name'] = value
+                elif key == 'player':
+                    board['player'] = [int(part) for part in value.split()]
+                elif key == 'ghosts':
+                    board['ghosts'] = [[int(part) for part in spawn.split()] for spawn in value.split(',')]
+                else:
+                    raise ValueError(f'line {number}: unknown key "{key}"')
+            except ValueError as error:
+                if str(error).startswith('line'):
+                    raise
+                raise ValueError(f'line {number}: "{value}" is not a list of numbers') from None
+        elif line.isdigit():
+            board['tiles'].append(line)
+        else:
+            raise ValueError(f'line {number}: "{line}" is not a row of tile digits')
+    return boards
+
+
+def parseJson(text):
+    data = json.loads(text)
+    boards = data['boards'] if isinstance(data, dict) else data
+    for number, board in enumerate(boards, 1):
+        board.setdefault('name', f'board {number}')
+    return boards
+
+
+def readTiles(board):  # the rows of a parsed board as lists of ints, whether they were digit strings or lists
+    return [[int(tile) for tile in row] for row in board.get('tiles', [])]
+
+
+def validateBoard(board):  # every problem that would stop the board being played properly, empty when it's fine
+    name = board['name']
+    tiles = readTiles(board)
+    if not tiles or not tiles[0]:
+        return [f'{name}: has no tiles']
+    rows, cols = len(tiles), len(tiles[0])
+    problems = []
+    for row, line in enumerate(tiles):
+        if len(line) != cols:
+            problems.append(f'{name}: row {row} has {len(line)} tiles, the first row has {cols}')
+        for col, tile in enumerate(line):
+            if not 0 <= tile < TILE_TYPES:
+                problems.append(f'{name}: unknown tile {tile} at ({row}, {col})')
+    if problems:
+        return problems
+
+    # the top and bottom rows must be walls, and an open side tile has to lead into the tunnel on the other side
+    for col in range(cols):
+        for row in (0, rows - 1):
+            if isWalkable(tiles[row][col]):
+                problems.append(f'{name}: the wall is open at ({row}, {col})')
+    for row in range(rows):
+        if isWalkable(tiles[row][0]) != isWalkable(tiles[row][cols - 1]):
+            col = 0 if isWalkable(tiles[row][0]) else cols - 1
+            problems.append(f'{name}: the wall is open at ({row}, {col}) with no tunnel on the other side')
+
+    player = tuple(board.get('player', DEFAULT_PLAYER_SPAWN))
+    ghosts = [tuple(spawn) for spawn in board.get('ghosts', DEFAULT_GHOST_SPAWNS)]
+    for what, spawn in [('player', player)] + [('ghost', spawn) for spawn in ghosts]:
+        if len(spawn) != 2 or not (0 <= spawn[0] < rows and 0 <= spawn[1] < cols):
+            problems.append(f'{name}: {what} spawn {spawn} is off the board')
+        elif not isWalkable(tiles[spawn[0]][spawn[1]]):
+            problems.append(f'{name}: {what} spawn {spawn} is not on a walkable tile')
+    if not ghosts:
+        problems.append(f'{name}: has no ghost spawns')
+    pellets = [(row, col) for row in range(rows) for col in range(cols) if tiles[row][col] in (1, 2)]
+    if not pellets:
+        problems.append(f'{name}: has no pellets, it would be cleared as soon as it started')
+    if problems:
+        return problems
+
+    # every pellet has to be reachable from where the player starts, or the level could never be finished
+    maze = Maze(tiles)
+    seen = bytearray(rows * cols)
+    seen[player[0] * cols + player[1]] = 1
+    queue = deque([player])
+    while queue:
+        row, col = queue.popleft()
+        mask = maze.readMask(row, col)
+        for direction in range(4):
+            if mask & DIRECTION_BITS[direction]:
+                next_row, next_col = stepFrom(row, col, direction, rows, cols)
+                if not seen[next_row * cols + next_col]:
+                    seen[next_row * cols + next_col] = 1
+                    queue.append((next_row, next_col))
+    stranded = [pellet for pellet in pellets if not seen[pellet[0] * cols + pellet[1]]]
+    if stranded:
+        more = f' and {len(stranded) - 3} more' if len(stranded) > 3 else ''
+        problems.append(f'{name}: pellets at {", ".join(map(str, stranded[:3]))}{more} can\'t be reached')
+    return problems
+
+
+def compileBoard(board):  # a board that passed validateBoard()
+    tiles = readTiles(board)
+    maze = Maze(tiles)
+    flat = bytearray(tile for row in tiles for tile in row)
+    return CompiledBoard(board['name'], maze.rows, maze.cols, flat, maze.turn_masks,
+                         flat.count(1) + flat.count(2), tuple(board.get('player', DEFAULT_PLAYER_SPAWN)),
+                         tuple(tuple(spawn) for spawn in board.get('ghosts', DEFAULT_GHOST_SPAWNS)))
+
+
+def compilePack(boards):  # checks every board first so all the problems are reported together
+    problems = [problem for board in boards for problem in validateBoard(board)]
+    if not boards:
+        problems.append('the pack has no boards')
+    if problems:
+        raise ValueError('invalid level pack:\n  ' + '\n  '.join(problems))
+    return [compileBoard(board) for board in boards]
+
+
+def packToBytes(pack):
+    data = bytearray(PACK_MAGIC)
+    data += PACK_HEADER.pack(len(pack))
+    for board in pack:
+        name = board.name.encode()
+        data += BOARD_HEADER.pack(len(name), board.rows, board.cols, board.pellets, *board.player_spawn,
+                                  len(board.ghost_spawns))
+        data += name
+        for spawn in board.ghost_spawns:
+            data += SPAWN.pack(*spawn)
+        data += board.tiles + board.turn_masks
+    return bytes(data)
+
+
+def packFromBytes(data):
+    if not data.startswith(PACK_MAGIC):
+        raise ValueError('not a compiled John-Man level pack')
+    offset = len(PACK_MAGIC)
+    (count,) = PACK_HEADER.unpack_from(data, offset)
+    offset += PACK_HEADER.size
+    pack = []
+    for _ in range(count):
+        name_size, rows, cols, pellets, player_row, player_col, ghost_count = BOARD_HEADER.unpack_from(data, offset)
+        offset += BOARD_HEADER.size
+        name = bytes(data[offset:offset + name_size]).decode()
+        offset += name_size
+        ghost_spawns = tuple(SPAWN.unpack_from(data, offset + i * SPAWN.size) for i in range(ghost_count))
+        offset += ghost_count * SPAWN.size
+        size = rows * cols
+        tiles = bytearray(data[offset:offset + size])
+        turn_masks = bytearray(data[offset + size:offset + 2 * size])
+        offset += 2 * size
+        if len(turn_masks) != size:
+            raise ValueError('compiled level pack is truncated')
+        pack.append(CompiledBoard(name, rows, cols, tiles, turn_masks, pellets, (player_row, player_col), ghost_spawns))
+    if offset != len(data):
+        raise ValueError('compiled level pack has trailing data')
+    return pack
+
+
+def loadPack(path, cache_dir=None):  # the compiled boards of a .json or text pack file
+    with open(path, 'rb') as file:
+        source = file.read()
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, hashlib.sha256(source).hexdigest()[:16] + '.lvl')
+        try:
+            with open(cache_path, 'rb') as file:
+                return packFromBytes(file.read())
+        except (OSError, ValueError, struct.error):
+            pass  # not cached yet, or written by another version, so compile it again
+
+    text = source.decode('utf-8-sig')
+    pack = compilePack(parseJson(text) if path.lower().endswith('.json') else parseText(text))
+    if cache_path is not None:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(cache_path, 'wb') as file:
+                file.write(packToBytes(pack))
+        except OSError:
+            pass  # the cache is only a speed-up, the pack is still usable without it
+    return pack
+
+
+def wallTile(tiles, row, col):  # the wall piece that joins up with the walls next to it, see board.py
+    rows, cols = len(tiles), len(tiles[0])
+    up = row > 0 and tiles[row - 1][col] >= 3
+    down = row < rows - 1 and tiles[row + 1][col] >= 3
+    left = col > 0 and tiles[row][col - 1] >= 3
+    right = col < cols - 1 and tiles[row][col + 1] >= 3
+    if (left or right) and not (up or down):
+        return 4
+    if left and down and not (up or right):
+        return 5
+    if right and down and not (up or left):
+        return 6
+    if right and up and not (down or left):
+        return 7
+    if left and up and not (down or right):
+        return 8
+    return 3
+
+
+def generateArena(rows, cols, seed=0):  # a random maze of dots for stress tests, as a board compilePack() takes
+    if rows < 5 or cols < 5:
+        raise ValueError(f'an arena needs at least 5x5 tiles, not {rows}x{cols}')
+    generator = random.Random(seed)
+    tiles = [[3] * cols for _ in range(rows)]
+    # paths run along the odd rows and columns, carved as a depth-first maze and then given loops to chase around
+    last_row = rows - 2 if rows % 2 else rows - 3  # the last odd row and column inside the outer wall
+    last_col = cols - 2 if cols % 2 else cols - 3
+    tiles[1][1] = 1
+    stack = [(1, 1)]
+    while stack:
+        row, col = stack[-1]
+        options = [(row + d_row, col + d_col) for d_row, d_col in ((0, 2), (0, -2), (2, 0), (-2, 0))
+                   if 1 <= row + d_row <= last_row and 1 <= col + d_col <= last_col
+                   and tiles[row + d_row][col + d_col] == 3]
+        if not options:
+            stack.pop()
+            continue
+        next_row, next_col = generator.choice(options)
+        tiles[(row + next_row) // 2][(col + next_col) // 2] = 1
+        tiles[next_row][next_col] = 1
+        stack.append((next_row, next_col))
+    for row in range(1, last_row + 1):
+        for col in range(1, last_col + 1):
+            if (row + col) % 2 and tiles[row][col] == 3 and generator.random() < ARENA_LOOPS:
+                tiles[row][col] = 1  # a wall between two paths, never a pillar where they cross
+
+    player = (last_row // 4 * 2 + 1, last_col // 4 * 2 + 1)  # the path crossing nearest the middle
+    ghosts = ((1, 1), (1, last_col), (last_row, 1), (last_row, last_col))
+    for row, col in ghosts:
+        tiles[row][col] = 2  # a big dot in every corner, like the classic board
+    tiles[player[0]][player[1]] = 0
+    tiles = [[wallTile(tiles, row, col) if tile >= 3 else tile for col, tile in enumerate(line)]
+             for row, line in enumerate(tiles)]
+    return {'name': f'arena {rows}x{cols} #{seed}', 'tiles': tiles, 'player': player, 'ghosts': ghosts}
+
+
+def builtinPack():  # the classic board from board.py, as a pack of one
+    from board import boards
+    return compilePack([{'name': 'Classic', 'tiles': boards}])
+
+
+def packHash(pack):  # tells compiled packs apart by their boards, wherever and however they were loaded
+    return hashlib.sha256(packToBytes(pack)).digest()[:8]
+
+
+def choosePack(path=None, arena=None, cache_dir=None):  # the pack main.py's --levels or --arena asks for
+    # arena is a size like "256x256", and with neither given it's the classic board
+    if arena:
+        try:
+            rows, cols = (int(size) for size in arena.lower().split('x'))
+        except ValueError:
+            raise ValueError(f'an arena size looks like 256x256, not "{arena}"') from None
+        return compilePack([generateArena(rows, cols)])
+    return loadPack(path, cache_dir) if path else builtinPack()
+
+
+if __name__ == '__main__':  # checks a pack and compiles it into the cache, the way the game will load it
+    import sys
+    import time
+    start = time.perf_counter()
+    pack = loadPack(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else '.levelcache')
+    print(f'{len(pack)} boards in {(time.perf_counter() - start) * 1000:.2f} ms')
+    for board in pack:
+        print(f'  {board.name}: {board.rows}x{board.cols}, {board.pellets} pellets, player at {board.player_spawn}, '
+              f'{len(board.ghost_spawns)} ghost spawns')
@@ -2,47 +2,216 @@ import pygame
 import random
 import asyncio
 import sys, os
-from board import boards
+import struct
+from array import array
+from assets import AssetRegistry, directionalFrames, resource_path
+from maze import Maze
+from levels import builtinPack, choosePack
+from pathfinding import DistanceFields, tableForMaze
+from replay import Replay
+from spatial import TileIndex
+from entities import EntityStore, view
 from typing import override
 
-def resource_path(relative_path):
-    if hasattr(sys, '_MEIPASS'):
-        return os.path.join(sys._MEIPASS, relative_path)
-    return os.path.join(os.path.abspath("."), relative_path)
-
 # create constant variables
 TILEWIDTH = 28
 TILEHEIGHT = 28
-NUMBERROWS = 32
+NUMBERROWS = 32  # the size of the classic board, each board of a level pack can have its own, see board_rows
 NUMBERCOLS = 30
-SCREENWIDTH = TILEWIDTH * NUMBERCOLS
-SCREENHEIGHT = TILEHEIGHT * NUMBERROWS
 BLACK = (0, 0, 0)
 GREEN = (150, 255, 197)
 WALL_THICKNESS = 3
 WALL_OFFSET = 0  # Removed offset to make walls connect properly
-
-# setting up the game including the screen size, clock, surface, and taking the level from the boards file
-pygame.init()
-screen = pygame.display.set_mode([SCREENWIDTH, SCREENHEIGHT])
-timer = pygame.time.Clock()
-surface = pygame.display.set_mode((SCREENWIDTH, SCREENHEIGHT))
+# the biggest the window gets. A board that wouldn't fit is drawn with smaller tiles, see tile_pixels
+MAX_WINDOW_SIZE = (1280, 960)
+BAND_ROWS = 16  # rows of a shrunk board drawn full size at a time before being scaled down onto its layer
+
+# setting up the game state, taking the levels from a level pack (the board.py board unless newGame() is given another). The window, clock and sprites are only
+# created by initDisplay() so the rules below can be imported and stepped without a display. The command line is only read by main()
+screen = None
+timer = None
+surface = None
 frames = 60
-level = []
-for row in boards:
-    level.append(row.copy())  # Create a copy of each row to avoid modifying the original board
+# the rules run at a fixed rate of game time whatever the frame rate is, and the speeds below count these ticks
+TICK_RATE = 60
+TICK_SECONDS = 1 / TICK_RATE
+MAX_FRAME_SECONDS = 0.25  # a longer stall (dragging the window, a breakpoint) is dropped instead of caught up
+tick_alpha = 0.0  # how far between the last tick and the next one the current frame is, used to draw in between
+LEVEL_CACHE_DIR = resource_path('.levelcache')  # where compiled level packs are kept between runs
+# the boards played in turn, each checked and compiled once when the pack is loaded, see levels.py. --levels
+# loads a pack file, or --arena 256x256 plays a single generated board for stress testing pathfinding and drawing
+level_pack = builtinPack()
+level_pack_path = None  # where main() got level_pack from, so a recording can load it again
+arena_size = None
+level = level_pack[0].toLevel()
+level_board = level_pack[0]  # the compiled board the current level list was laid out from, with its spawns
+board_rows, board_cols = level_board.rows, level_board.cols  # movement wraps and clamps to these
+# how big a tile is drawn on screen. The rules always work in TILEWIDTH pixels a tile, only a board too big for
+# MAX_WINDOW_SIZE is drawn smaller, so the window and the cached board layers stay within that size
+tile_pixels = TILEWIDTH
+maze = None  # turn masks of the current level, see currentMaze()
+pellets_remaining = 0  # dots and big dots left on pellets_level, counted once and then kept up to date
+pellets_level = None
+paths = None  # distance fields or all-pairs table over the current maze, see currentPaths()
+paths_maze = None
+paths_mode = None  # the ghost_pathfinding they were made for
 counter = 0
 turns_allowed = [False, False, False, False]  # [right, left, up, down]
 startup_counter = 0
 player_speed = 7 # Speed of the player, lower is faster
 ghost_speed = 8
 running = True  # global variable for the game loop
+# only redraw and push the areas that changed each frame instead of flipping the whole screen, --dirty-rects
+dirty_rect_mode = False
+# 'manhattan' steers ghosts by straight-line distance like the original game, 'bfs' (--bfs-ghosts) follows real
+# maze distances searched per target, and 'table' (--path-table) reads them from a table of every pair of tiles
+PATHFINDING_MODES = ('manhattan', 'bfs', 'table')
+ghost_pathfinding = 'manhattan'
+PATH_CACHE_DIR = resource_path('.pathcache')  # where all-pairs tables are kept between runs
+# where the ghosts' random choices come from. Until a game is seeded this is the shared random module, once
+# seeded it is the game's own generator so the same seed and inputs always play out the same way
+rng = random
+game_seed = None
+eaten_cells = array('I')  # cell indexes of the pellets eaten from eaten_level so far, in the order they went
+eaten_level = None
+# a bot steers the player instead of the keyboard, for attract mode and soak tests, --autopilot
+autopilot_mode = False
+# --profile times every phase of the loop and shows p50/p99 in a corner, --profile-csv also saves every frame's times on exit
+profile_csv = None
+profile_mode = False
+profiler = None  # a profiler.Profiler while profiling, update() and drawDirty() report their phases to it
+# the input of the game being played, saved to the file after --record when the window is closed
+replay_path = None
+recording = None
+# how many sprites were loaded, how long it took and how much memory they use, printed once the window opens with --asset-report
+asset_report = False
+# ghosts in a game, the four characters take turns so --ghosts 200 makes a swarm of 50 of each
+number_of_ghosts = 4
+ghost_index = None  # a spatial.TileIndex of the ghosts, see ghostIndex()
+ghost_index_list = None
+
+MASK64 = (1 << 64) - 1
+
+
+class GameRandom(random.Random):  # random.Random driven by splitmix64, its whole state is one int that's cheap to copy
+    def seed(self, a=None, version=2):
+        self.state = random.Random(a).getrandbits(64)  # any seed random.Random takes, spread over 64 bits
+
+    def getstate(self):
+        return self.state
+
+    def setstate(self, state):
+        self.state = state
+
+    def next64(self):
+        self.state = z = (self.state + 0x9E3779B97F4A7C15) & MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        return z ^ (z >> 31)
+
+    def random(self):
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+
+    def getrandbits(self, k):  # choice(), randrange() and the rest of random.Random build on this
+        bits = filled = 0
+        while filled < k:
+            bits |= self.next64() << filled
+            filled += 64
+        return bits & ((1 << k) - 1)
+
+
+def seedRandom(seed):  # gives the game its own generator, seeded so a run can be played again exactly
+    global rng, game_seed
+    rng = GameRandom(seed)
+    game_seed = seed
+
+
+def currentBoard():  # the board of the pack being played, after the last board the pack starts again
+    return level_pack[levels_cleared % len(level_pack)]
+
+def startLevel():  # lays out a fresh list from the current board, its walls and pellet count are already known
+    global level, level_board, maze, pellets_remaining, pellets_level
+    level_board = currentBoard()
+    level = level_board.toLevel()
+    maze = Maze(level, level_board.turn_masks)
+    pellets_remaining = level_board.pellets
+    pellets_level = level
+    fitBoard()
+    invalidateBoard()  # the new level's walls and pellets are rendered once on the next draw, not every frame
+
+def fitBoard():  # takes on level_board's size, for the movement bounds, the ghost index and the window
+    global board_rows, board_cols, ghost_index, tile_pixels
+    if (board_rows, board_cols) != (level_board.rows, level_board.cols):
+        board_rows, board_cols = level_board.rows, level_board.cols
+        tile_pixels = max(1, min(TILEWIDTH, MAX_WINDOW_SIZE[0] // board_cols, MAX_WINDOW_SIZE[1] // board_rows))
+        ghost_index = None  # filed again at the new size
+        if screen is not None:
+            resizeWindow()
+
+def ghostSpawn(character):  # where a ghost character starts on the current board, and the corner it flees to
+    spawns = level_board.ghost_spawns
+    return spawns[character % len(spawns)]
+
+def currentMaze():  # the precomputed walls of whatever list is the current level, rebuilt when it is replaced
+    global maze
+    if maze is None or maze.level is not level:
+        maze = Maze(level)
+    return maze
+
+def remainingPellets():  # pellets left on the current level, only counted when a new level list appears
+    global pellets_remaining, pellets_level
+    if pellets_level is not level:
+        pellets_remaining = sum(row.count(1) + row.count(2) for row in level)
+        pellets_level = level
+    return pellets_remaining
+
+def ghostIndex():  # the tile every ghost is on, filed again from scratch whenever the ghosts list is replaced
+    global ghost_index, ghost_index_list
+    if ghost_index is None or ghost_index_list is not ghosts or len(ghost_index) != len(ghosts):
+        ghost_index = TileIndex(board_rows, board_cols)
+        for ghost in ghosts:
+            ghost_index.add(ghost, ghost.readRow(), ghost.readCol())
+        ghost_index_list = ghosts
+    return ghost_index
+
+def eatenCells():  # pellets eaten from the current level, started again whenever a new level list appears
+    global eaten_cells, eaten_level
+    if eaten_level is not level:
+        eaten_cells = array('I')
+        eaten_level = level
+    return eaten_cells
+
+def eatPellet(row, col):  # removes the pellet at (row, col) from the level, the count and the pellet layer
+    global pellets_remaining
+    remainingPellets()  # make sure the count belongs to this level before changing it
+    eatenCells().append(row * len(level[row]) + col)
+    level[row][col] = 0
+    pellets_remaining -= 1
+    erasePellet(row, col)
+
+def currentPaths():  # maze distances for the current level, shared by every ghost
+    global paths, paths_maze, paths_mode
+    current = currentMaze()
+    if paths is None or paths_maze is not current or paths_mode != ghost_pathfinding:
+        # a table can also come back as distance fields when the board is too big for one
+        paths = tableForMaze(current, PATH_CACHE_DIR) if ghost_pathfinding == 'table' else DistanceFields(current)
+        paths_maze = current
+        paths_mode = ghost_pathfinding
+    return paths
 
 # set the title of the window
 title = 'John-Man'
-pygame.display.set_caption(title)
+levels_cleared = 0
+
+# every sprite is loaded once by initDisplay() and reused for the whole run, including across reset_level()
+assets = AssetRegistry()
+def playerFrames(player_images):  # the registry's own table for its player sprites, any other images get a new one
+    if list(player_images) == assets.player:
+        return assets.player_frames
+    return directionalFrames(player_images)
 
 class Object:  # create object class that works as a parent class for all the objects drawn onto the screen at launch
+    __slots__ = ('__surface', '__row', '__col', '__xPos', '__yPos', '__sprite', 'previous_row', 'previous_col')
     def __init__(self, plane, row, col, xPos, yPos, sprite=None):  # add sprite as an optional parameter
         self.__surface = plane
         self.__row = row
@@ -50,6 +219,10 @@ class Object:  # create object class that works as a parent class for all the ob
         self.__xPos = col * TILEWIDTH
         self.__yPos = row * TILEHEIGHT
         self.__sprite = sprite
+        self.previous_row = row  # tile the object was on before its last move, drawn sliding from it to the current one
+        self.previous_col = col
+    def setSurface(self, plane):  # lets objects made before the window existed draw onto it
+        self.__surface = plane
     # all the read functions allow the properties of the object to be called
     def readSurface(self):
         return self.__surface
@@ -74,6 +247,17 @@ class Object:  # create object class that works as a parent class for all the ob
         center_y = self.__yPos + TILEHEIGHT // 2
         return center_y
 
+    def moveProgress(self):  # how far through the move from the previous tile to the current one it is, 0 to 1
+        return 1.0
+
+    def readDrawPos(self):  # pixel position to draw at, partway between the previous tile and the current one
+        row_step = self.__row - self.previous_row
+        col_step = self.__col - self.previous_col
+        if abs(row_step) + abs(col_step) != 1:  # standing still, wrapping through the tunnel or put back somewhere
+            return self.__xPos, self.__yPos
+        remaining = 1.0 - self.moveProgress()
+        return round(self.__xPos - col_step * remaining * TILEWIDTH), round(self.__yPos - row_step * remaining * TILEHEIGHT)
+
     def drawSprite(self):  # draws sprite onto the object
         if self.__sprite:
             pygame.draw.circle(self.__surface, GREEN, self.readCentrePos(), 2)
@@ -86,33 +270,10 @@ class Object:  # create object class that works as a parent class for all the ob
             self.__surface.blit(self.__sprite, (center_x, center_y))
 
     def checkTurns(self):
-        turns = [False, False, False, False]  # [right, left, up, down]
-
-        # Get current row and column positions
-        current_row = self.readRow()
-        current_col = self.readCol()
-
-        next_col = current_col + 1
-        if next_col < NUMBERCOLS and level[current_row][next_col] < 3:
-            turns[0] = True
-
-        # Check left movement
-        next_col = current_col - 1
-        if next_col >= 0 and level[current_row][next_col] < 3:
-            turns[1] = True
-
-        # Check up movement
-        next_row = current_row - 1
-        if next_row >= 0 and level[next_row][current_col] < 3:
-            turns[2] = True
-
-        # Check down movement
-        next_row = current_row + 1
-        if next_row < NUMBERROWS and level[next_row][current_col] < 3:
-            turns[3] = True
-
-        return turns
+        # walls never change during a level, so every cell's [right, left, up, down] was worked out up front
+        return currentMaze().readTurns(self.readRow(), self.readCol())
 class Wall(Object):     # create subclass specifically for walls 
+    __slots__ = ('__wallType',)
     def __init__(self, plane, row, col, x_pos, yPos, wallType):
         super().__init__(plane, row, col, x_pos, yPos)
         self.__wallType = wallType  # special variable for the type of wall
@@ -200,71 +361,113 @@ class Wall(Object):     # create subclass specifically for walls
                     WALL_THICKNESS
                 )
 class Pellet(Object): # special class for the pellets that the player collects
+    __slots__ = ()
     def __init__(self, plane, row, col, x_pos, yPos, sprite):
         super().__init__(plane, row, col, x_pos, yPos, sprite)
-class Player(Object): # player is a subclass of object
-    def __init__(self, plane, row, col, x_pos, y_pos, direction, direction_command, player_images, points, power, power_counter, player_speed):
+class Entity(Object):  # an object that moves, its position and movement are views of its element in an EntityStore
+    __slots__ = ('store', 'slot')
+    _Object__row = view('row')
+    _Object__col = view('col')
+    _Object__xPos = view('x_pos')
+    _Object__yPos = view('y_pos')
+    previous_row = view('previous_row')
+    previous_col = view('previous_col')
+    direction = view('direction')
+    move_counter = view('move_counter')
+
+    def __init__(self, plane, row, col, x_pos, y_pos, store=None, slot=0):
+        self.store = EntityStore(1) if store is None else store  # its own one-entity store unless given a shared one
+        self.slot = slot
         super().__init__(plane, row, col, x_pos, y_pos)
+    # the readers are called every tick, so they go straight to the columns instead of through the views
+    @override
+    def readRow(self):
+        return self.store.row[self.slot]
+    @override
+    def readCol(self):
+        return self.store.col[self.slot]
+    @override
+    def readXPos(self):
+        return self.store.x_pos[self.slot]
+    @override
+    def readYPos(self):
+        return self.store.y_pos[self.slot]
+    @override
+    def checkTurns(self):
+        return currentMaze().readTurns(self.store.row[self.slot], self.store.col[self.slot])
+class Player(Entity): # player is a subclass of object
+    __slots__ = ('direction_command', 'player_images', 'direction_frames', 'points', 'power', 'power_counter',
+                 'lives', 'animation_counter', 'rect')
+    player_speed = view('speed')
+    def __init__(self, plane, row, col, x_pos, y_pos, direction, direction_command, player_images, points, power, power_counter, player_speed, store=None, slot=0):
+        super().__init__(plane, row, col, x_pos, y_pos, store, slot)
         self.direction = direction
         self.direction_command = direction_command
         self.player_images = player_images
+        self.direction_frames = playerFrames(player_images)  # [direction][frame], built once per set of images
         self.move_counter = 0
         self.points = points
         self.power = power
         self.power_counter = power_counter
-        self.eaten_ghosts = [False, False, False, False]
         self.lives = 3
         self.animation_counter = 0
         self.player_speed = player_speed
     def checkGhostCollisions(self):
+        # the player and ghosts take up 36 pixels on 28 pixel tiles, so they only touch when a ghost is on the
+        # player's tile or one of the 8 around it. Ghosts are still handled in list order, each one against
+        # wherever the player is by the time it comes up, just like checking every ghost in turn
+        index = ghostIndex()
+        handled = -1
+        while True:
+            ghost = next((ghost for ghost in index.near(self.readRow(), self.readCol())
+                          if index.rank(ghost) > handled), None)
+            if ghost is None:
+                return
+            handled = index.rank(ghost)
+            if self.power and not ghost.eaten:
+                # Player eats ghost, only this one, in a swarm the others of its character still flee
+                ghost.eaten = True
+                self.points += 100  # Points for eating a ghost
+
+                # Make ghost return to box
+                ghost.mortality = True
+
+                # Reset ghost position to their corners
+                ghost._Object__row, ghost._Object__col = ghostSpawn(ghost.character)
+
+                # Update pixel positions
+                ghost._Object__xPos = ghost._Object__col * TILEWIDTH
+                ghost._Object__yPos = ghost._Object__row * TILEHEIGHT
+                ghost.updateRect()
+
+            elif not self.power and not ghost.mortality:
+                # Ghost eats player
+                self.lives -= 1
+                title = f'John Man — Score: {player.points} — Lives: {player.lives} — Speed: {player.player_speed}'
+                pygame.display.set_caption(title)
+                if self.lives > 0:
+                    # Reset player position
+                    row, col = level_board.player_spawn
+                    self._Object__row = row
+                    self._Object__col = col
+                    self._Object__xPos = col * TILEWIDTH
+                    self._Object__yPos = row * TILEHEIGHT
+                    self.direction = 0
+                    self.direction_command = 0
+                else:
+                    # Game over
+                    global running
+                    running = False
+    @property
+    def eaten_ghosts(self):  # [character] whether a ghost of that character was eaten this power up, see Ghost.eaten
+        eaten = [False, False, False, False]
         for ghost in ghosts:
-            # Check if player and ghost positions overlap
-            player_rect = pygame.rect.Rect(self.readCentreXPos() - 18, self.readCentreYPos() - 18, 36, 36)
-
-            if player_rect.colliderect(ghost.rect):
-                if self.power and not self.eaten_ghosts[ghost.character]:
-                    # Player eats ghost
-                    self.eaten_ghosts[ghost.character] = True
-                    self.points += 100  # Points for eating a ghost
-
-                    # Make ghost return to box
-                    ghost.mortality = True
-
-                    # Reset ghost position to their corners
-                    if ghost.character == 0:
-                        ghost._Object__row = 2
-                        ghost._Object__col = 2
-                    elif ghost.character == 1:
-                        ghost._Object__row = 2
-                        ghost._Object__col = 27
-                    elif ghost.character == 2:
-                        ghost._Object__row = 30
-                        ghost._Object__col = 2
-                    else:
-                        ghost._Object__row = 30
-                        ghost._Object__col = 27
-
-                    # Update pixel positions
-                    ghost._Object__xPos = ghost._Object__col * TILEWIDTH
-                    ghost._Object__yPos = ghost._Object__row * TILEHEIGHT
-
-                elif not self.power and not ghost.mortality:
-                    # Ghost eats player
-                    self.lives -= 1
-                    title = f'John Man — Score: {player.points} — Lives: {player.lives} — Speed: {player.player_speed}'
-                    pygame.display.set_caption(title)
-                    if self.lives > 0:
-                        # Reset player position
-                        self._Object__row = 18
-                        self._Object__col = 15
-                        self._Object__xPos = 15 * TILEWIDTH
-                        self._Object__yPos = 18 * TILEHEIGHT
-                        self.direction = 0
-                        self.direction_command = 0
-                    else:
-                        # Game over
-                        global running
-                        running = False
+            if ghost.eaten:
+                eaten[ghost.character] = True
+        return eaten
+    def setImages(self, player_images):  # swaps in a new set of animation frames
+        self.player_images = player_images
+        self.direction_frames = playerFrames(player_images)
     @override
     def readPoints(self):
         return self.points
@@ -272,80 +475,70 @@ class Player(Object): # player is a subclass of object
         current_sprite = None
         sprite_index = (self.animation_counter // 3) % len(self.player_images) # cycles through the player animation
 
-        if self.direction == 0:  # Right
-            current_sprite = self.player_images[sprite_index]
-        elif self.direction == 1:  # Left
-            current_sprite = pygame.transform.flip(self.player_images[sprite_index], True, False)
-        elif self.direction == 2:  # Up
-            current_sprite = pygame.transform.rotate(self.player_images[sprite_index], 90)
-        elif self.direction == 3:  # Down
-            current_sprite = pygame.transform.rotate(self.player_images[sprite_index], 270)
+        if 0 <= self.direction <= 3:  # right, left, up, down were all flipped/rotated ahead of time
+            current_sprite = self.direction_frames[self.direction][sprite_index]
 
         if current_sprite:
             # Center the sprite in the tile
-            sprite_width = current_sprite.get_width()
-            sprite_height = current_sprite.get_height()
-            center_x = self.readXPos() + (TILEWIDTH - sprite_width) // 2
-            center_y = self.readYPos() + (TILEHEIGHT - sprite_height) // 2
-            self.readSurface().blit(current_sprite, (center_x, center_y))
-        
-        # Increment the animation counter continuously
-        self.animation_counter += 1
+            blitOnTile(self.readSurface(), current_sprite, *self.readDrawPos())
+    @override
+    def moveProgress(self):  # the next move happens once move_counter reaches player_speed
+        return min(1.0, (self.move_counter + tick_alpha) / max(1, self.player_speed))
     def movePlayer(self):
+        store, slot = self.store, self.slot  # straight to the store columns, like moveGhost
         for i in range(4):
             if self.direction_command == i and turns_allowed[i]: # check if the player can turn in the direction they want to go
-                self.direction = i
+                store.direction[slot] = i
 
-        self.move_counter += 1
+        store.move_counter[slot] += 1
 
-        if self.move_counter >= self.player_speed: # counter allows me to change speed of the player
-            self.move_counter = 0
+        if store.move_counter[slot] >= store.speed[slot]: # counter allows me to change speed of the player
+            store.move_counter[slot] = 0
+            row, col = store.row[slot], store.col[slot]
+            store.previous_row[slot], store.previous_col[slot] = row, col
+            direction = store.direction[slot]
 
-            if turns_allowed[self.direction]:
-                if self.direction == 0:  # Moving right
-                    current_col = self.readCol()
-                    new_col = current_col + 1
-                    if new_col >= NUMBERCOLS:
+            if turns_allowed[direction]:
+                if direction == 0:  # Moving right
+                    new_col = col + 1
+                    if new_col >= board_cols:
                         new_col = 0
-                    self._Object__col = new_col
-                    self._Object__xPos = new_col * TILEWIDTH
+                    store.col[slot] = new_col
+                    store.x_pos[slot] = new_col * TILEWIDTH
 
-                elif self.direction == 1:  # Moving left
-                    current_col = self.readCol()
-                    new_col = current_col - 1
+                elif direction == 1:  # Moving left
+                    new_col = col - 1
                     if new_col < 0:
-                        new_col = NUMBERCOLS - 1  # Teleport to right side
-                    self._Object__col = new_col
-                    self._Object__xPos = new_col * TILEWIDTH
+                        new_col = board_cols - 1  # Teleport to right side
+                    store.col[slot] = new_col
+                    store.x_pos[slot] = new_col * TILEWIDTH
 
-                elif self.direction == 2:  # Moving up
-                    current_row = self.readRow()
-                    new_row = current_row - 1
+                elif direction == 2:  # Moving up
+                    new_row = row - 1
                     if new_row >= 0:
-                        self._Object__row = new_row
-                        self._Object__yPos = new_row * TILEHEIGHT
-
-                elif self.direction == 3:  # Moving down
-                    current_row = self.readRow()
-                    new_row = current_row + 1
-                    if new_row < NUMBERROWS:
-                        self._Object__row = new_row
-                        self._Object__yPos = new_row * TILEHEIGHT
+                        store.row[slot] = new_row
+                        store.y_pos[slot] = new_row * TILEHEIGHT
+
+                elif direction == 3:  # Moving down
+                    new_row = row + 1
+                    if new_row < board_rows:
+                        store.row[slot] = new_row
+                        store.y_pos[slot] = new_row * TILEHEIGHT
     def checkCollisions(self):
         current_tile = level[self.readRow()][self.readCol()]
         if current_tile == 1: # Check if the player is on a dot
-            level[self.readRow()][self.readCol()] = 0 # remove dot
+            eatPellet(self.readRow(), self.readCol()) # remove dot
             self.points += 1 # increase score
             title = f'John Man — Score: {self.points} — Lives: {self.lives} — Speed: {self.player_speed}'
             pygame.display.set_caption(title)
         if current_tile == 2: # Check if the player is on a big dot
-            level[self.readRow()][self.readCol()] = 0
+            eatPellet(self.readRow(), self.readCol())
             self.points += 10 # big dots get more points
             self.power = True # activate power pellet
             self.power_counter = 0
             title = f'John Man — Score: {self.points} — Lives: {self.lives} — Speed: {self.player_speed}'
             pygame.display.set_caption(title)
-        return self.points, self.power, self.power_counter, self.eaten_ghosts
+        return self.points, self.power, self.power_counter
     def powerUp(self): # manages the player's power state
         if self.power and self.power_counter < 600:
             self.power_counter += 1
@@ -353,66 +546,88 @@ class Player(Object): # player is a subclass of object
             self.power_counter = 0
             self.power = False
 
-            for i, eaten in enumerate(self.eaten_ghosts): # reset eaten ghosts when power up ends
-                if eaten:
-                    for ghost in ghosts:
-                        if ghost.character == i:
-                            ghost.mortality = False
-
-            self.eaten_ghosts = [False, False, False, False]
-class Ghost(Object): # ghost is a subclass of object
-    def __init__(self, plane, row, col, x_pos, y_pos, character, target, box, mortality, ghost_images, direction, speed):
-        super().__init__(plane, row, col, x_pos, y_pos)
+            for ghost in ghosts: # reset eaten ghosts when power up ends
+                if ghost.eaten:
+                    ghost.mortality = False
+                    ghost.eaten = False
+def refileGhost(ghost):  # keeps the ghost index up to date however a ghost's tile gets changed
+    if ghost_index is not None:
+        ghost_index.move(ghost, ghost.readRow(), ghost.readCol())
+class Ghost(Entity): # ghost is a subclass of object
+    __slots__ = ('character', 'target', 'in_box', 'ghost_images', 'turns_allowed', 'rect')
+    _Object__row = view('row', changed=refileGhost)
+    _Object__col = view('col', changed=refileGhost)
+    speed = view('speed')
+    mortality = view('mortality')
+    eaten = view('eaten')  # eaten by the player during the current power up, so no longer frightened
+    def __init__(self, plane, row, col, x_pos, y_pos, character, target, box, mortality, ghost_images, direction, speed, store=None, slot=0):
+        super().__init__(plane, row, col, x_pos, y_pos, store, slot)
         self.character = character
         self.target = target
         self.speed = speed  # Speed of the ghost, lower is faster
         self.in_box = box
         self.mortality = mortality  # if the ghost is dead
+        self.eaten = False
         self.ghost_images = ghost_images
         self.direction = direction
         self.move_counter = 0
         self.turns_allowed = [False, False, False, False]
-        # Remove the drawSprite call from init - this should be called in the game loop
-        self.rect = pygame.rect.Rect(0, 0, 36, 36)  # Initialize with default rect
+        # the collision rect follows the ghost's tile so collisions work without drawSprite having run
+        self.rect = pygame.rect.Rect(0, 0, 36, 36)
+        self.updateRect()
+
+    def updateRect(self):  # centres the collision rect on the ghost's current tile
+        self.rect = pygame.rect.Rect(self.readCentreXPos() - 18, self.readCentreYPos() - 18, 36, 36)
+        return self.rect
+
+    @override
+    def moveProgress(self):
+        return min(1.0, (self.move_counter + tick_alpha) / max(1, self.speed))
 
     def moveGhost(self):
         self.turns_allowed = self.checkTurns()
-        self.move_counter += 1
+        self.advance()
+
+    def advance(self):  # moveGhost for when turns_allowed is already this tile's
+        # reads and writes this ghost's store columns directly, it runs for every ghost on every tick
+        store, slot = self.store, self.slot
+        store.move_counter[slot] += 1
         # Debug print to see if the function is being called
         # print(f"Ghost {self.character}: move_counter={self.move_counter}, direction={self.direction}, turns_allowed={self.turns_allowed}")
-        if self.move_counter >= self.speed:
-            self.move_counter = 0
+        if store.move_counter[slot] >= store.speed[slot]:
+            store.move_counter[slot] = 0
+            row, col = store.row[slot], store.col[slot]
+            store.previous_row[slot], store.previous_col[slot] = row, col
+            direction = store.direction[slot]
 
-            if self.turns_allowed[self.direction]:
+            if self.turns_allowed[direction]:
                 # print(f"Ghost {self.character} moving in direction {self.direction}")
-                if self.direction == 0:  # Moving right
-                    current_col = self.readCol()
-                    new_col = current_col + 1
-                    if new_col >= NUMBERCOLS:
+                if direction == 0:  # Moving right
+                    new_col = col + 1
+                    if new_col >= board_cols:
                         new_col = 0
-                    self._Object__col = new_col
-                    self._Object__xPos = new_col * TILEWIDTH
-                elif self.direction == 1:  # Moving left
-                    current_col = self.readCol()
-                    new_col = current_col - 1
+                    store.col[slot] = new_col
+                    store.x_pos[slot] = new_col * TILEWIDTH
+                elif direction == 1:  # Moving left
+                    new_col = col - 1
                     if new_col < 0:
-                        new_col = NUMBERCOLS - 1
-                    self._Object__col = new_col
-                    self._Object__xPos = new_col * TILEWIDTH
-                elif self.direction == 2:  # Moving up
-                    current_row = self.readRow()
-                    new_row = current_row - 1
+                        new_col = board_cols - 1
+                    store.col[slot] = new_col
+                    store.x_pos[slot] = new_col * TILEWIDTH
+                elif direction == 2:  # Moving up
+                    new_row = row - 1
                     if new_row >= 0:
-                        self._Object__row = new_row
-                        self._Object__yPos = new_row * TILEHEIGHT
-                elif self.direction == 3:  # Moving down
-                    current_row = self.readRow()
-                    new_row = current_row + 1
-                    if new_row < NUMBERROWS:
-                        self._Object__row = new_row
-                        self._Object__yPos = new_row * TILEHEIGHT
+                        store.row[slot] = new_row
+                        store.y_pos[slot] = new_row * TILEHEIGHT
+                elif direction == 3:  # Moving down
+                    new_row = row + 1
+                    if new_row < board_rows:
+                        store.row[slot] = new_row
+                        store.y_pos[slot] = new_row * TILEHEIGHT
+                refileGhost(self)
             else:
-                self.findRandomDirection() # if the ghost can't turn in the direction it wants to go, find a random direction
+                self.pickRandomDirection() # if the ghost can't turn in the direction it wants to go, find a random direction
+            self.updateRect()
     def checkDeadBox(self): # checks if the ghosts are in the dead box
         current_tile = level[self.readRow()][self.readCol()]
         if 13 <= self.readXPos() <= 18 and 14 <= self.readYPos() <= 17: # coordinate range for the dead box
@@ -422,6 +637,14 @@ class Ghost(Object): # ghost is a subclass of object
         return self.in_box
     def findPath(self, player_row, player_col):
         self.turns_allowed = self.checkTurns()
+        red_ghost = None
+        if self.character == 2 and len(ghosts) > 0:  # Inky's target depends on where the red ghost is
+            red_ghost = next((ghost for ghost in ghosts if ghost.character == 0), None)
+        target_row, target_col, randomness_factor = self.findTarget(player_row, player_col, red_ghost)
+        return self.chooseDirection(target_row, target_col, randomness_factor)
+
+    def findTarget(self, player_row, player_col, red_ghost):  # the tile this ghost heads for, and how often it wanders instead
+        row, col = self.readRow(), self.readCol()
 
         # Give each ghost a distinct personality
         if self.character == 0:  # Red ghost (Blinky) - Direct chaser
@@ -435,91 +658,84 @@ class Ghost(Object): # ghost is a subclass of object
             # Target 4 tiles ahead of player based on player's direction
             if player.direction == 0:  # Right
                 target_row = player_row
-                target_col = (player_col + 4) % NUMBERCOLS
+                target_col = (player_col + 4) % board_cols
             elif player.direction == 1:  # Left
                 target_row = player_row
-                target_col = (player_col - 4) % NUMBERCOLS
+                target_col = (player_col - 4) % board_cols
             elif player.direction == 2:  # Up
                 target_row = max(0, player_row - 4)
                 target_col = player_col
             elif player.direction == 3:  # Down
-                target_row = min(NUMBERROWS - 1, player_row + 4)
+                target_row = min(board_rows - 1, player_row + 4)
                 target_col = player_col
         elif self.character == 2:  # Blue ghost (Inky) - Complex targeting
             # Targets position based on both player and red ghost
             randomness_factor = 0.25
-            if len(ghosts) > 0 and self.character != 0:  # Ensure red ghost exists and this isn't the red ghost
-                red_ghost = None
-                for ghost in ghosts:
-                    if ghost.character == 0:
-                        red_ghost = ghost
-                        break
-
-                if red_ghost:
-                    # Target is vector from red ghost to player, doubled
-                    target_row = player_row + (player_row - red_ghost.readRow())
-                    target_row = max(0, min(target_row, NUMBERROWS - 1))
-                    target_col = player_col + (player_col - red_ghost.readCol())
-                    target_col = max(0, min(target_col, NUMBERCOLS - 1))
-                else:
-                    # Fallback if red ghost not found
-                    target_row = player_row
-                    target_col = player_col
+            if red_ghost is not None:
+                # Target is vector from red ghost to player, doubled
+                target_row = player_row + (player_row - red_ghost.readRow())
+                target_row = max(0, min(target_row, board_rows - 1))
+                target_col = player_col + (player_col - red_ghost.readCol())
+                target_col = max(0, min(target_col, board_cols - 1))
             else:
+                # Fallback if red ghost not found
                 target_row = player_row
                 target_col = player_col
         else:  # Orange ghost (Clyde) - Shy
             # Pursues player directly when far, but wanders when close
             randomness_factor = 0.35
-            distance_to_player = abs(player_row - self.readRow()) + abs(player_col - self.readCol())
+            if ghost_pathfinding == 'manhattan':
+                distance_to_player = abs(player_row - row) + abs(player_col - col)
+            else:  # how far Clyde really has to walk, not the straight-line distance through walls
+                distance_to_player = currentPaths().distance(row, col, player_row, player_col)
             if distance_to_player < 8:  # When close to player, retreat to corner
-                target_row = 30
-                target_col = 2
+                target_row, target_col = ghostSpawn(2)  # Bottom-left
             else:  # When far, chase directly
                 target_row = player_row
                 target_col = player_col
 
         # When player has power, all ghosts run away (but with different patterns)
-        if player.power and not player.eaten_ghosts[self.character]:
-            # Different ghosts have different "scatter" corners when fleeing
-            if self.character == 0:
-                target_row, target_col = 2, 2  # Top-left
-            elif self.character == 1:
-                target_row, target_col = 2, 27  # Top-right
-            elif self.character == 2:
-                target_row, target_col = 30, 2  # Bottom-left
-            else:
-                target_row, target_col = 30, 27  # Bottom-right
+        if player.power and not self.eaten:
+            # Different ghosts have different "scatter" corners when fleeing, the ones they started in
+            target_row, target_col = ghostSpawn(self.character)
 
             # Increase randomness when fleeing to make movement less predictable
             randomness_factor += 0.2
+        return target_row, target_col, randomness_factor
+
+    def chooseDirection(self, target_row, target_col, randomness_factor):  # turns_allowed must be this tile's already
+        row, col = self.readRow(), self.readCol()  # read once, every candidate move below starts from here
 
         # Random movement chance
-        if random.random() < randomness_factor:
-            self.findRandomDirection()
+        if rng.random() < randomness_factor:
+            self.pickRandomDirection()
             return self.direction
 
         # Find best direction towards target
         best_direction = -1
 
-        if player.power and not player.eaten_ghosts[self.character]:
+        if ghost_pathfinding != 'manhattan':
+            # shortest path along the maze to the target, which is the scatter corner while fleeing,
+            # so walls never leave the ghost stuck needing a random direction
+            best_direction = currentPaths().bestDirection(row, col, target_row, target_col, self.turns_allowed)
+        elif player.power and not self.eaten:
             # Run away - maximize distance to target
             max_distance = -float('inf')
 
             for i in range(4):
                 if self.turns_allowed[i]:
                     if i == 0:  # Right
-                        temp_row = self.readRow()
-                        temp_col = (self.readCol() + 1) % NUMBERCOLS
+                        temp_row = row
+                        temp_col = (col + 1) % board_cols
                     elif i == 1:  # Left
-                        temp_row = self.readRow()
-                        temp_col = (self.readCol() - 1) % NUMBERCOLS
+                        temp_row = row
+                        temp_col = (col - 1) % board_cols
                     elif i == 2:  # Up
-                        temp_row = max(0, self.readRow() - 1)
-                        temp_col = self.readCol()
+                        temp_row = max(0, row - 1)
+                        temp_col = col
                     elif i == 3:  # Down
-                        temp_row = min(NUMBERROWS - 1, self.readRow() + 1)
-                        temp_col = self.readCol()
+                        temp_row = min(board_rows - 1, row + 1)
+                        temp_col = col
 
                     # Calculate Manhattan distance to the target
                     temp_distance = abs(target_row - temp_row) + abs(target_col - temp_col)
@@ -535,17 +751,17 @@ class Ghost(Object): # ghost is a subclass of object
             for i in range(4):
                 if self.turns_allowed[i]:
                     if i == 0:  # Right
-                        temp_row = self.readRow()
-                        temp_col = (self.readCol() + 1) % NUMBERCOLS
+                        temp_row = row
+                        temp_col = (col + 1) % board_cols
                     elif i == 1:  # Left
-                        temp_row = self.readRow()
-                        temp_col = (self.readCol() - 1) % NUMBERCOLS
+                        temp_row = row
+                        temp_col = (col - 1) % board_cols
                     elif i == 2:  # Up
-                        temp_row = max(0, self.readRow() - 1)
-                        temp_col = self.readCol()
+                        temp_row = max(0, row - 1)
+                        temp_col = col
                     elif i == 3:  # Down
-                        temp_row = min(NUMBERROWS - 1, self.readRow() + 1)
-                        temp_col = self.readCol()
+                        temp_row = min(board_rows - 1, row + 1)
+                        temp_col = col
 
                     # Calculate Manhattan distance to target
                     temp_distance = abs(target_row - temp_row) + abs(target_col - temp_col)
@@ -559,39 +775,25 @@ class Ghost(Object): # ghost is a subclass of object
         if best_direction != -1:
             self.direction = best_direction
         else:
-            self.findRandomDirection()
+            self.pickRandomDirection()
 
         return self.direction
         # use code from player movement
     def findRandomDirection(self):
         self.turns_allowed = self.checkTurns()
+        self.pickRandomDirection()
 
+    def pickRandomDirection(self):  # findRandomDirection for when turns_allowed is already this tile's
         # Get all valid directions
         valid_dirs = [i for i, valid in enumerate(self.turns_allowed) if valid]
 
         if not valid_dirs:
             # Ghost is stuck (shouldn't happen)
             # Try to reset position to a known safe location
-            if self.character == 0:
-                self._Object__row = 2
-                self._Object__col = 2
-                self._Object__xPos = 2 * TILEWIDTH
-                self._Object__yPos = 2 * TILEHEIGHT
-            elif self.character == 1:
-                self._Object__row = 2
-                self._Object__col = 27
-                self._Object__xPos = 27 * TILEWIDTH
-                self._Object__yPos = 2 * TILEHEIGHT
-            elif self.character == 2:
-                self._Object__row = 30
-                self._Object__col = 2
-                self._Object__xPos = 2 * TILEWIDTH
-                self._Object__yPos = 30 * TILEHEIGHT
-            elif self.character == 3:
-                self._Object__row = 30
-                self._Object__col = 27
-                self._Object__xPos = 27 * TILEWIDTH
-                self._Object__yPos = 30 * TILEHEIGHT
+            row, col = ghostSpawn(self.character)
+            self._Object__row, self._Object__col = row, col
+            self._Object__xPos, self._Object__yPos = col * TILEWIDTH, row * TILEHEIGHT
+            self.updateRect()
             return
 
         # Different ghosts have different movement patterns
@@ -601,143 +803,233 @@ class Ghost(Object): # ghost is a subclass of object
         # Character 3: Prefers turning
         continue_straight_chance = 0.7 - (self.character * 0.2)
 
-        if self.direction in valid_dirs and random.random() < continue_straight_chance:
+        if self.direction in valid_dirs and rng.random() < continue_straight_chance:
             # Continue in same direction
             return
 
         # Otherwise choose a random valid direction
-        self.direction = random.choice(valid_dirs)
+        self.direction = rng.choice(valid_dirs)
     @override
     def drawSprite(self): # Override the parent method with no additional parameters
-        # Get player power and eaten ghosts from the global player object
+        # Get player power from the global player object
         player_power = player.power
-        eaten_ghosts = player.eaten_ghosts
         
         current_sprite = None
 
         # Determine which sprite to use
         if self.mortality:  # Ghost is dead (eyes only)
             current_sprite = self.ghost_images[5]
-        elif player_power and not eaten_ghosts[self.character]:
+        elif player_power and not self.eaten:
             current_sprite = self.ghost_images[4]  # Scared ghost sprite
         else:  # Normal ghost state
             current_sprite = self.ghost_images[self.character]
 
         # Center the sprite in the tile (like the Player class does)
         if current_sprite:
-            sprite_width = current_sprite.get_width()
-            sprite_height = current_sprite.get_height()
-            center_x = self.readXPos() + (TILEWIDTH - sprite_width) // 2
-            center_y = self.readYPos() + (TILEHEIGHT - sprite_height) // 2
-            self.readSurface().blit(current_sprite, (center_x, center_y))
+            blitOnTile(self.readSurface(), current_sprite, *self.readDrawPos())
 
         # Create collision rect centered on the ghost
-        self.rect = pygame.rect.Rect(self.readCentreXPos() - 18, self.readCentreYPos() - 18, 36, 36)
-        return self.rect
+        return self.updateRect()
 
-sprite_paths = {
-    0: resource_path("assets/grid/0.png"),
-    1: resource_path("assets/grid/1.png"),
-    2: resource_path("assets/grid/2.png")
-}
-sprites = {key: pygame.image.load(path) for key, path in sprite_paths.items()}
 
 objectList: list[Object] = []     # create list to house the objects
+def blitOnTile(plane, sprite, x_pos, y_pos):  # draws a sprite centred on the tile at (x_pos, y_pos) in game pixels
+    if tile_pixels != TILEWIDTH:  # a board shrunk to fit the window, the sprite and where it goes shrink with it
+        sprite = assets.shrunk(sprite, tile_pixels / TILEWIDTH)
+        x_pos, y_pos = x_pos * tile_pixels // TILEWIDTH, y_pos * tile_pixels // TILEHEIGHT
+    plane.blit(sprite, (x_pos + (tile_pixels - sprite.get_width()) // 2, y_pos + (tile_pixels - sprite.get_height()) // 2))
+
+def renderTiles(layer, top, left, rows, cols, drawTile, reach=0):
+    # for a board shrunk to fit the window: draws an area of tiles full size, along with the tiles up to reach
+    # around it whose sprites spill over into it, then scales it down into its place on the layer
+    band = pygame.Surface(((cols + 2 * reach) * TILEWIDTH, (rows + 2 * reach) * TILEHEIGHT), layer.get_flags() & pygame.SRCALPHA, 32)
+    for i in range(max(0, top - reach), min(len(level), top + rows + reach)):
+        for j in range(max(0, left - reach), min(len(level[i]), left + cols + reach)):
+            drawTile(band, i, j, top - reach, left - reach)
+    area = band.subsurface((reach * TILEWIDTH, reach * TILEHEIGHT, cols * TILEWIDTH, rows * TILEHEIGHT))
+    place = pygame.Rect(left * tile_pixels, top * tile_pixels, cols * tile_pixels, rows * tile_pixels)
+    layer.fill((0, 0, 0, 0), place)
+    layer.blit(pygame.transform.smoothscale(area, place.size), place, special_flags=pygame.BLEND_RGBA_ADD)  # a copy, onto the cleared area
+    return place
+
+maze_surface = None  # walls pre-rendered off-screen, rebuilt whenever a level is loaded or reset
+def drawWallTile(plane, row, col, top=0, left=0):  # the wall at (row, col), onto a plane whose corner is tile (top, left)
+    if 3 <= level[row][col] <= 8:  # wall types, the gate (9) stays undrawn like before
+        wall = Wall(plane, row - top, col - left, (col - left) * TILEWIDTH, (row - top) * TILEHEIGHT, level[row][col])
+        wall.drawWall()
+
+def buildMaze():     # draws every wall of the current level once onto its own surface
+    global maze_surface, full_redraw
+    full_redraw = True
+    maze_surface = pygame.Surface(boardSize())
+    maze_surface.fill(BLACK)
+    if tile_pixels != TILEWIDTH:
+        for top in range(0, len(level), BAND_ROWS):
+            renderTiles(maze_surface, top, 0, min(BAND_ROWS, len(level) - top), len(level[0]), drawWallTile)
+        return maze_surface
+    for i in range(len(level)):
+        for j in range(len(level[i])):
+            drawWallTile(maze_surface, i, j)
+    return maze_surface
+
+pellet_surface = None  # pellets drawn once per level, then patched one tile at a time as they get eaten
+def drawPelletTile(plane, row, col, top=0, left=0):  # the pellet at (row, col) if there is one, like drawWallTile()
+    if level[row][col] == 1 or level[row][col] == 2:
+        drawPellet(row, col, plane, top, left)
+
+def pelletReach():  # how many tiles past their own the pellet sprites spill over
+    sprite_width = max(assets.grid[1].get_width(), assets.grid[2].get_width())
+    sprite_height = max(assets.grid[1].get_height(), assets.grid[2].get_height())
+    return max((sprite_width - 1) // TILEWIDTH, (sprite_height - 1) // TILEHEIGHT)
+
+def buildPellets():  # stamps every remaining pellet of the current level onto a transparent layer
+    global pellet_surface, full_redraw
+    full_redraw = True
+    pellet_surface = pygame.Surface(boardSize(), pygame.SRCALPHA)
+    if tile_pixels != TILEWIDTH:
+        for top in range(0, len(level), BAND_ROWS):
+            renderTiles(pellet_surface, top, 0, min(BAND_ROWS, len(level) - top), len(level[0]), drawPelletTile, pelletReach())
+        return pellet_surface
+    for i in range(len(level)):
+        for j in range(len(level[i])):
+            drawPelletTile(pellet_surface, i, j)
+    return pellet_surface
+
+def invalidateBoard():  # drops the cached board layers so they get rebuilt from the new level
+    global maze_surface, pellet_surface
+    maze_surface = None
+    pellet_surface = None
+
+def drawPellet(row, col, plane=None, top=0, left=0):  # onto the pellet layer unless given a plane, see drawWallTile()
+    sprite = assets.grid[level[row][col]]
+    pellet = Pellet(plane or pellet_surface, row - top, col - left, (col - left) * TILEWIDTH, (row - top) * TILEHEIGHT, sprite)
+    pellet.drawSprite()
+
+def erasePellet(row, col):  # called once the pellet at (row, col) has been removed from the level
+    if pellet_surface is None:
+        return
+    if tile_pixels != TILEWIDTH:  # the eaten pellet's tile and the ones its sprite covered are drawn again
+        reach = pelletReach()
+        footprint = renderTiles(pellet_surface, row - reach, col - reach, 2 * reach + 1, 2 * reach + 1, drawPelletTile, reach)
+        if dirty_rect_mode:
+            pending_rects.append(footprint)
+        return
+    # the pellet sprites are bigger than a tile, so clear the whole sprite footprint
+    # and redraw any neighbouring pellets that overlapped it
+    sprite_width = max(assets.grid[1].get_width(), assets.grid[2].get_width())
+    sprite_height = max(assets.grid[1].get_height(), assets.grid[2].get_height())
+    footprint = pygame.Rect(col * TILEWIDTH + (TILEWIDTH - sprite_width) // 2,
+                            row * TILEHEIGHT + (TILEHEIGHT - sprite_height) // 2,
+                            sprite_width, sprite_height)
+    pellet_surface.fill((0, 0, 0, 0), footprint)
+    reach_cols = (sprite_width - 1) // TILEWIDTH
+    reach_rows = (sprite_height - 1) // TILEHEIGHT
+    pellet_surface.set_clip(footprint)
+    for i in range(max(0, row - reach_rows), min(len(level), row + reach_rows + 1)):
+        for j in range(max(0, col - reach_cols), min(len(level[i]), col + reach_cols + 1)):
+            if level[i][j] == 1 or level[i][j] == 2:
+                drawPellet(i, j)
+    pellet_surface.set_clip(None)
+    if dirty_rect_mode:
+        pending_rects.append(footprint)
+
 def drawGrid():     # create a function to draw all the objects needed on the screen
-    for i in range(len(level)):     # loops through the rows in the board file
-        for j in range(len(level[i])):  # loops through all the columns for each row
-            x_pos = j * TILEWIDTH
-            y_pos = i * TILEHEIGHT
-
-            #pygame.draw.rect(surface, (255, 0, 0), (x_pos, y_pos, TILEWIDTH, TILEHEIGHT), 1)
-            #dots_remaining =
-            match level[i][j]:
-                case 0: # blank square
-                    pygame.draw.rect(surface, (0, 0, 0, 0), (j * TILEWIDTH, i * TILEHEIGHT, TILEWIDTH, TILEHEIGHT))
-                case 1: # little dot
-                    sprite = sprites.get(1, sprites[1])
-                    pellet = Pellet(surface, i, j, j * TILEWIDTH, i * TILEHEIGHT, sprite)
-                    pellet.drawSprite()
-                case 2: # lobster (big dot)
-                    sprite = sprites.get(2, sprites[2])
-                    pellet = Pellet(surface, i, j, j * TILEWIDTH, i * TILEHEIGHT, sprite)
-                    pellet.drawSprite()
-                case 3:
-                    wall = Wall(surface, i, j, x_pos, y_pos, 3)
-                    wall.drawWall()
-                case 4:
-                    wall = Wall(surface, i, j, x_pos, y_pos, 4)
-                    wall.drawWall()
-                case 5:  # Top right corner
-                    wall = Wall(surface, i, j, x_pos, y_pos, 5)
-                    wall.drawWall()
-                case 6:  # Top left corner
-                    wall = Wall(surface, i, j, x_pos, y_pos, 6)
-                    wall.drawWall()
-                case 7:  # Bottom left corner
-                    wall = Wall(surface, i, j, x_pos, y_pos, 7)
-                    wall.drawWall()
-                case 8:  # Bottom right corner
-                    wall = Wall(surface, i, j, x_pos, y_pos, 8)
-                    wall.drawWall()
-                case _:
-                    pygame.draw.rect(screen, (0, 0, 0, 0), (j * TILEWIDTH, i * TILEHEIGHT, TILEWIDTH, TILEHEIGHT))
-
-player_sprites: list[pygame.Surface] = []
-player = Player(surface, 18, 15, 18 * TILEWIDTH, 15 * TILEHEIGHT, 0, 0, player_sprites, 0, False, 0, player_speed)
+    if maze_surface is None:
+        buildMaze()
+    if pellet_surface is None:
+        buildPellets()
+    # walls never change during a level and pellets are only patched when eaten, so two blits draw the board
+    surface.blit(maze_surface, (0, 0))
+    surface.blit(pellet_surface, (0, 0))
+
+player_sprites: list[pygame.Surface] = []  # filled in by initDisplay() once the sprites are loaded
+player = Player(surface, *level_board.player_spawn, level_board.player_spawn[1] * TILEWIDTH,
+                level_board.player_spawn[0] * TILEHEIGHT, 0, 0, player_sprites, 0, False, 0, player_speed)
 def drawPlayer():
-    for i in range(1, 4):
-        sprite = pygame.image.load(resource_path(f'assets/john/{i}.png'))
-       #sprite = pygame.transform.scale(sprite, (TILEWIDTH, TILEHEIGHT))  # Scale to tile size (28x28)
-        sprite.set_colorkey((255, 255, 255))  # Make white transparent
-        player_sprites.append(sprite)
     player.drawSprite()
     player.checkTurns()
 
 ghosts: list[Ghost] = []
+def spawnGhosts(count=None):  # creates the ghosts in their corners, number_of_ghosts of them unless told otherwise
+    global ghost_index
+    ghost_index = None  # new ghosts, so ghostIndex() files them all again
+    # Create ghosts at different corner positions, side by side in one store
+    count = number_of_ghosts if count is None else count
+    store = EntityStore(count)
+    for i in range(count):
+        row, col = ghostSpawn(i % 4)
+        ghost = Ghost(surface, row, col, col * TILEWIDTH, row * TILEHEIGHT, i % 4, player, False, False, assets.ghosts, 0, ghost_speed, store, i)
+        ghosts.append(ghost)
+
 def drawGhosts():
-    global ghosts  # Make sure we're using the global ghosts list
-    
     # Only create ghosts if the list is empty (first time)
     if not ghosts:
-        ghost_sprites = []
+        spawnGhosts()
 
-        # Load ghost sprites
-        for i in range(1, 7):
-            sprite = pygame.image.load(resource_path(f'assets/ghosts/{i}.png'))
-            sprite.set_colorkey((254, 254, 254))
-            ghost_sprites.append(sprite)
-        
-        # Define corner positions for each ghost
-        ghost_positions = [
-            (2, 2),      # Ghost 0: Top-left corner
-            (2, 27),     # Ghost 1: Top-right corner
-            (30, 2),     # Ghost 2: Bottom-left corner
-            (30, 27)     # Ghost 3: Bottom-right corner
-        ]
-        
-        # Create ghosts at different corner positions
-        for i in range(4):
-            row, col = ghost_positions[i]
-            ghost = Ghost(surface, row, col, col * TILEWIDTH, row * TILEHEIGHT, i, player, False, False, ghost_sprites, 0, ghost_speed)
-            ghosts.append(ghost)
-    
     # Draw all ghosts
     for ghost in ghosts:
         ghost.drawSprite()  # Call without parameters now
 
+full_redraw = True  # set whenever the board layers are rebuilt so the next dirty-rect frame repaints everything
+previous_rects = {}  # screen area each moving object covered the last time it was drawn
+pending_rects: list[pygame.Rect] = []  # other areas that changed since the last frame, like eaten pellets
+entity_size = TILEWIDTH  # grows to the largest player/ghost sprite once initDisplay() has loaded them
+def entityRect(obj):  # the screen area a player or ghost sprite covers where it is drawn this frame
+    x_pos, y_pos = obj.readDrawPos()
+    size = entity_size * tile_pixels // TILEWIDTH
+    rect = pygame.Rect(0, 0, size, size)
+    rect.center = ((x_pos + TILEWIDTH // 2) * tile_pixels // TILEWIDTH, (y_pos + TILEHEIGHT // 2) * tile_pixels // TILEHEIGHT)
+    return rect
+
+def drawDirty():  # draws the frame and returns the rects that changed, or None if the whole screen did
+    global full_redraw
+    if full_redraw or maze_surface is None or pellet_surface is None:
+        drawGrid()
+        if profiler:
+            profiler.lap('drawGrid')
+        drawPlayer()
+        if profiler:
+            profiler.lap('drawPlayer')
+        drawGhosts()
+        if profiler:
+            profiler.lap('drawGhosts')
+        previous_rects.clear()
+        for obj in [player] + ghosts:
+            previous_rects[obj] = entityRect(obj)
+        pending_rects.clear()
+        full_redraw = False
+        return None
+
+    # restore the cached board under where every moving object was and now is, then draw them on top
+    changed = pending_rects[:]
+    for obj in [player] + ghosts:
+        if obj in previous_rects:
+            changed.append(previous_rects[obj])
+        previous_rects[obj] = entityRect(obj)
+        changed.append(previous_rects[obj])
+    for rect in changed:
+        surface.blit(maze_surface, rect, rect)
+        surface.blit(pellet_surface, rect, rect)
+    if profiler:
+        profiler.lap('drawGrid')
+    drawPlayer()
+    if profiler:
+        profiler.lap('drawPlayer')
+    drawGhosts()
+    if profiler:
+        profiler.lap('drawGhosts')
+    pending_rects.clear()
+    return changed
 
-def check_level_complete():
-    dots_remaining = False
 
-    # Check if any dots remain in the level
-    for row in level:
-        if 1 in row or 2 in row:
-            dots_remaining = True
-            break
+def check_level_complete():
+    # the count is kept up to date as pellets are eaten, so no need to scan the board every frame
+    dots_remaining = remainingPellets() > 0
 
     if not dots_remaining:
         # Level complete - reset the board and increase speed
+        global levels_cleared
+        levels_cleared += 1
         player.lives += 1  # Give player an extra life if they complete the level
         reset_level()
         increase_speed()
@@ -746,47 +1038,30 @@ def check_level_complete():
 
 
 def reset_level():
-    global level, boards
-
-    # Instead of trying to copy boards, just reload the level from the board.py file
-    from board import boards as original_boards
-
-    # Reset the level with fresh data from import
-    level = []
-    for row in original_boards:
-        level.append(row.copy())
+    startLevel()  # the next board of the pack, nothing to parse or count again
 
     # Reset ghost positions
-    for i, ghost in enumerate(ghosts):
-        # Reset ghosts to their starting positions
-        if i == 0:  # Ghost 0: Top-left
-            ghost._Object__row = 2
-            ghost._Object__col = 2
-        elif i == 1:  # Ghost 1: Top-right
-            ghost._Object__row = 2
-            ghost._Object__col = 27
-        elif i == 2:  # Ghost 2: Bottom-left
-            ghost._Object__row = 30
-            ghost._Object__col = 2
-        elif i == 3:  # Ghost 3: Bottom-right
-            ghost._Object__row = 30
-            ghost._Object__col = 27
+    for ghost in ghosts:
+        # Reset ghosts to their starting positions on the new board
+        ghost._Object__row, ghost._Object__col = ghostSpawn(ghost.character)
 
         # Update pixel positions
         ghost._Object__xPos = ghost._Object__col * TILEWIDTH
         ghost._Object__yPos = ghost._Object__row * TILEHEIGHT
+        ghost.updateRect()
         ghost.mortality = False  # Reset mortality
+        ghost.eaten = False
 
     # Reset player position
-    player._Object__row = 18
-    player._Object__col = 15
-    player._Object__xPos = 15 * TILEWIDTH
-    player._Object__yPos = 18 * TILEHEIGHT
+    row, col = level_board.player_spawn
+    player._Object__row = row
+    player._Object__col = col
+    player._Object__xPos = col * TILEWIDTH
+    player._Object__yPos = row * TILEHEIGHT
     player.direction = 0
     player.direction_command = 0
     player.power = False
     player.power_counter = 0
-    player.eaten_ghosts = [False, False, False, False]
 
 
 def increase_speed():
@@ -807,37 +1082,273 @@ def increase_speed():
     title = f'John Man — Score: {player.points} — Lives: {player.lives} — Speed: {player_speed}'
     pygame.display.set_caption(title)
 
-async def main():
-    global running, counter, turns_allowed
-    
-    running = True  # game loop
-    while running:
-        timer.tick(frames)
-
-        if counter < 15:
-            counter += 1
+def newGame(start_player_speed=7, start_ghost_speed=8, seed=None, pack=None, ghost_count=None, pathfinding=None):
+    # puts every piece of game state back to a fresh game. The level pack, number of ghosts and ghost pathfinding
+    # stay the way the last game had them unless they're given
+    global counter, turns_allowed, player_speed, ghost_speed, running, player, ghosts, levels_cleared
+    global level_pack, number_of_ghosts, ghost_pathfinding
+    if pathfinding is not None and pathfinding not in PATHFINDING_MODES:
+        raise ValueError(f'ghost pathfinding is one of {", ".join(PATHFINDING_MODES)}, not "{pathfinding}"')
+    if pack is not None:
+        level_pack = pack
+    if ghost_count is not None:
+        number_of_ghosts = ghost_count
+    if pathfinding is not None:
+        ghost_pathfinding = pathfinding
+    counter = 0
+    turns_allowed = [False, False, False, False]
+    player_speed = start_player_speed
+    ghost_speed = start_ghost_speed
+    running = True
+    levels_cleared = 0
+    startLevel()
+    if seed is not None:
+        seedRandom(seed)
+    row, col = level_board.player_spawn
+    player = Player(surface, row, col, col * TILEWIDTH, row * TILEHEIGHT, 0, 0, assets.player, 0, False, 0, player_speed)
+    ghosts = []
+    spawnGhosts()
+    invalidateBoard()
+
+
+# the fields a game carries from one tick to the next, packed into one struct per number of ghosts
+STATE_FIELDS = 'HBBBI?I'  # ghosts, counter, player speed, ghost speed, levels cleared, running, pellets remaining
+# row, col, previous row, previous col, direction, direction command, move counter, speed, points, power,
+# power counter, lives (signed, ghosts catching the player on its last life can take it below 0), animation counter
+PLAYER_FIELDS = 'HHHHBBBBI?HhI'
+# row, col, previous row, previous col, direction, move counter, speed, mortality, in box, eaten
+GHOST_FIELDS = 'HHHHBBB???'
+_state_structs = {}  # ghost count -> struct.Struct
+
+
+def stateStruct(ghost_count):
+    if ghost_count not in _state_structs:
+        _state_structs[ghost_count] = struct.Struct('<' + STATE_FIELDS + PLAYER_FIELDS + GHOST_FIELDS * ghost_count)
+    return _state_structs[ghost_count]
+
+
+class GameState:  # a copy of the whole game, small and cheap enough for bots to take thousands of per decision
+    # pellets are the only tiles the rules change, so the level is stored as the pellets eaten from the board
+    __slots__ = ('eaten', 'fields', 'random_state', 'level')
+
+    def __init__(self, eaten, fields, random_state, level_list=None):
+        self.eaten = eaten                # eatenCells() as bytes
+        self.fields = fields              # stateStruct() bytes of the globals, the player and every ghost
+        self.random_state = random_state  # rng.getstate(), so the ghosts' random moves carry on the same way
+        self.level = level_list           # the level list to put back, or None to reuse the current one
+
+    @classmethod
+    def snapshot(cls):  # the current game
+        values = [len(ghosts), counter, player_speed, ghost_speed, levels_cleared, running, remainingPellets(),
+                  player._Object__row, player._Object__col, player.previous_row, player.previous_col,
+                  player.direction, player.direction_command, player.move_counter, player.player_speed,
+                  player.points, player.power, player.power_counter, player.lives, player.animation_counter]
+        for ghost in ghosts:
+            values += (ghost._Object__row, ghost._Object__col, ghost.previous_row, ghost.previous_col,
+                       ghost.direction, ghost.move_counter, ghost.speed, ghost.mortality, ghost.in_box, ghost.eaten)
+        return cls(eatenCells().tobytes(), stateStruct(len(ghosts)).pack(*values), rng.getstate(), level)
+
+    def restore(self):  # puts the game back the way it was when this snapshot was taken
+        global counter, player_speed, ghost_speed, levels_cleared, running, pellets_remaining, pellets_level
+        global eaten_cells, pellet_surface, level, level_board
+        ghost_count = struct.unpack_from('<H', self.fields)[0]
+        values = stateStruct(ghost_count).unpack(self.fields)
+        counter, player_speed, ghost_speed, levels_cleared, running, pellets_remaining = values[1:7]
+        (row, col, player.previous_row, player.previous_col, player.direction, player.direction_command,
+         player.move_counter, player.player_speed, player.points, player.power, player.power_counter,
+         player.lives, player.animation_counter) = values[7:20]
+        player._Object__row, player._Object__col = row, col
+        player._Object__xPos, player._Object__yPos = col * TILEWIDTH, row * TILEHEIGHT
+        swapped = self.level is not None and self.level is not level
+        if swapped:  # a level completed since the snapshot swaps in a new list, swap it back
+            level = self.level
+            if level_board is not currentBoard():
+                level_board = currentBoard()
+                fitBoard()
+                invalidateBoard()  # and its walls with it
+        elif level_board is not currentBoard():  # the snapshot was on another board of the pack, lay that one out
+            startLevel()
+        start = level_board.tiles
+
+        if len(ghosts) != ghost_count:
+            ghosts.clear()
+            spawnGhosts(ghost_count)
+        offset = 20
+        for ghost in ghosts:
+            (row, col, ghost.previous_row, ghost.previous_col, ghost.direction, ghost.move_counter, ghost.speed,
+             ghost.mortality, ghost.in_box, ghost.eaten) = values[offset:offset + 10]
+            offset += 10
+            ghost._Object__row, ghost._Object__col = row, col
+            ghost._Object__xPos, ghost._Object__yPos = col * TILEWIDTH, row * TILEHEIGHT
+            ghost.updateRect()
+
+        # the level list itself is kept so the maze and paths stay cached. Usually the snapshot's pellets are the
+        # start of the ones eaten since, so only those need putting back, otherwise (or when the list was swapped
+        # back and its own log went with the level after it) the board is laid out again
+        current = eatenCells()
+        eaten_cells = array('I')
+        eaten_cells.frombytes(self.eaten)
+        cols = len(level[0])
+        if not swapped and current.tobytes()[:len(self.eaten)] == self.eaten:
+            for cell in current[len(eaten_cells):]:
+                level[cell // cols][cell % cols] = start[cell]
+            changed = len(current) != len(eaten_cells)
         else:
-            counter = 0
+            for number, row in enumerate(level):
+                row[:] = start[number * cols:(number + 1) * cols]
+            for cell in eaten_cells:
+                level[cell // cols][cell % cols] = 0
+            changed = True
+        if changed:
+            pellet_surface = None  # a change of board invalidated the walls above, otherwise only pellets changed
+        pellets_level = level
+        rng.setstate(self.random_state)
+
+    def __eq__(self, other):
+        return (isinstance(other, GameState) and self.eaten == other.eaten and self.fields == other.fields
+                and self.random_state == other.random_state)
+
+    def toBytes(self):  # for keeping on disk, only for games seeded with seedRandom() so the random state is one int
+        return struct.pack('<IIQ', len(self.eaten), len(self.fields), self.random_state) + self.eaten + self.fields
+
+    @classmethod
+    def fromBytes(cls, data):
+        eaten_size, fields_size, random_state = struct.unpack_from('<IIQ', data)
+        start = struct.calcsize('<IIQ')
+        return cls(bytes(data[start:start + eaten_size]),
+                   bytes(data[start + eaten_size:start + eaten_size + fields_size]), random_state)
+
+
+def update():  # advances the game rules by one tick, this needs no display so it can run headless
+    global counter, turns_allowed
+
+    if counter < 15:
+        counter += 1
+    else:
+        counter = 0
+    player.animation_counter += 1  # the player's mouth moves with the game, not with how often it is drawn
+
+    # each phase is only timed while profiling, so a normal tick doesn't pay for the timing
+    turns_allowed = player.checkTurns() # Check if the player can turn in each direction
+    if profiler:
+        profiler.lap('checkTurns')
+    player.movePlayer()
+    if profiler:
+        profiler.lap('movePlayer')
+    player.checkCollisions()
+    if profiler:
+        profiler.lap('checkCollisions')
+    player.powerUp()
+    if profiler:
+        profiler.lap('powerUp')
+    player.checkGhostCollisions()
+    if profiler:
+        profiler.lap('checkGhostCollisions')
+
+    check_level_complete()
+    if profiler:
+        profiler.lap('check_level_complete')
+
+    updateGhosts()
+    if profiler:
+        profiler.ticks += 1
+
+
+def updateGhosts():  # decides and moves every ghost for this tick in one pass
+    # the player stands still while the ghosts move, and the red ghost Inky works from only needs finding once.
+    # Ghosts still take their turns in list order, so Inky sees the red ghost after its move like before
+    player_row, player_col = player.readRow(), player.readCol()
+    red_ghost = next((ghost for ghost in ghosts if ghost.character == 0), None)
+    read_turns = currentMaze().readTurns
+    for ghost in ghosts:
+        store, slot = ghost.store, ghost.slot
+        row, col = store.row[slot], store.col[slot]
+        ghost.turns_allowed = read_turns(row, col)  # once per ghost, deciding and moving both use it
+        if profiler:
+            profiler.lap('checkTurns')
+        if counter % (4 + ghost.character) == 0:  # Different timing for each ghost
+            ghost.chooseDirection(*ghost.findTarget(player_row, player_col, red_ghost))
+            if store.row[slot] != row or store.col[slot] != col:  # a stuck ghost was put back in its corner
+                ghost.turns_allowed = read_turns(store.row[slot], store.col[slot])
+            if profiler:
+                profiler.lap('findPath')
+        ghost.advance()
+        if profiler:
+            profiler.lap('moveGhost')
+
+
+def boardSize():  # the current board in screen pixels, which is also the size of the window
+    return board_cols * tile_pixels, board_rows * tile_pixels
+
+
+def resizeWindow():  # a board of another size was started, the window and everything drawing on it follow
+    global screen, surface
+    screen = surface = pygame.display.set_mode(boardSize())
+    player.setSurface(surface)
+    for ghost in ghosts:
+        ghost.setSurface(surface)
 
-        screen.fill(BLACK)
-        drawGrid()
-        drawPlayer()
-        drawGhosts()
-        turns_allowed = player.checkTurns() # Check if the player can turn in each direction
-        player.movePlayer()
-        player.checkCollisions()
-        player.powerUp()
-        player.checkGhostCollisions()
 
-        check_level_complete()
+def initDisplay():  # opens the window and loads the sprites, only the pygame front end needs this
+    global screen, surface, timer, entity_size
+    pygame.init()
+    screen = pygame.display.set_mode(boardSize())
+    surface = screen
+    timer = pygame.time.Clock()
+    pygame.display.set_caption(title)
+
+    assets.loadAll()
+    if asset_report:
+        print(assets.report())
+    entity_size = max(TILEWIDTH, TILEHEIGHT, *(max(sprite.get_size()) for sprite in assets.player + assets.ghosts))
+
+    # objects made before the window existed get pointed at it and given their sprites
+    player_sprites[:] = assets.player
+    player.setSurface(surface)
+    player.setImages(player_sprites)
+    for ghost in ghosts:
+        ghost.setSurface(surface)
+        ghost.ghost_images = assets.ghosts
+    invalidateBoard()
+
+
+def argValue(flag):  # the word after a flag on the command line, or None if it wasn't given
+    return sys.argv[sys.argv.index(flag) + 1] if flag in sys.argv[:-1] else None
+
+
+async def main():
+    global running, tick_alpha, recording, profiler, level_pack_path, arena_size
+    global dirty_rect_mode, autopilot_mode, profile_csv, profile_mode, replay_path, asset_report
+    dirty_rect_mode = '--dirty-rects' in sys.argv
+    autopilot_mode = '--autopilot' in sys.argv
+    profile_csv = argValue('--profile-csv')
+    profile_mode = '--profile' in sys.argv or profile_csv is not None
+    replay_path = argValue('--record')
+    asset_report = '--asset-report' in sys.argv
+    level_pack_path, arena_size = argValue('--levels'), argValue('--arena')
+    pack = choosePack(level_pack_path, arena_size, LEVEL_CACHE_DIR)
+    ghost_count = int(argValue('--ghosts') or 4)
+    pathfinding = 'bfs' if '--bfs-ghosts' in sys.argv else 'table' if '--path-table' in sys.argv else 'manhattan'
+
+    initDisplay()
+    seed = int.from_bytes(os.urandom(8))
+    newGame(player_speed, ghost_speed, seed, pack, ghost_count, pathfinding)
+    recording = Replay(seed, player_speed, ghost_speed, ghost_count, pathfinding, level_pack_path, arena_size, pack)
+    pilot = None
+    if autopilot_mode:
+        from autopilot import Autopilot
+        pilot = Autopilot()
+    if profile_mode:
+        from profiler import Profiler
+        profiler = Profiler()
+    running = True  # game loop
+    accumulator = 0.0  # game time waiting to be simulated
+    while running:
+        # a slow frame runs several ticks to catch up and a fast one may run none, so the game keeps the same pace
+        accumulator += min(timer.tick(frames) / 1000, MAX_FRAME_SECONDS)
+        if profiler:
+            profiler.mark()  # waiting for the next frame isn't part of any phase
 
-        # Move all ghosts
-        for ghost in ghosts:
-            ghost.turns_allowed = ghost.checkTurns()
-            if counter % (4 + ghost.character) == 0:  # Different timing for each ghost
-                ghost.findPath(player.readRow(), player.readCol())
-            ghost.moveGhost()
-        
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
@@ -860,10 +1371,57 @@ async def main():
                 if event.key == pygame.K_DOWN and player.direction_command == 3:
                     player.direction_command = 3
 
-        pygame.display.flip()
+        if profiler:
+            profiler.lap('events')
+        while running and accumulator >= TICK_SECONDS:
+            if pilot:
+                player.direction_command = pilot.steer()
+                if profiler:
+                    profiler.lap('autopilot')
+            recording.recordTick(player.direction_command, GameState.snapshot)
+            if profiler:
+                profiler.mark()
+            update()
+            accumulator -= TICK_SECONDS
+        tick_alpha = accumulator / TICK_SECONDS
+
+        if profiler:
+            profiler.mark()
+        if dirty_rect_mode:
+            changed_rects = drawDirty()
+        else:
+            screen.fill(BLACK)
+            drawGrid()
+            if profiler:
+                profiler.lap('drawGrid')
+            drawPlayer()
+            if profiler:
+                profiler.lap('drawPlayer')
+            drawGhosts()
+            if profiler:
+                profiler.lap('drawGhosts')
+            changed_rects = None
+        if profiler:
+            overlay_rect = profiler.drawOverlay(screen)
+            if changed_rects is not None:
+                changed_rects.append(overlay_rect)
+            profiler.lap('overlay')
+
+        if changed_rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(changed_rects)  # only push the parts of the screen that changed
+        if profiler:
+            profiler.lap('flip')
+            profiler.endFrame()
         await asyncio.sleep(0)  # Yield control to allow other coroutines to run
     
+    if replay_path:
+        recording.save(replay_path)
+    if profile_csv:
+        profiler.writeCsv(profile_csv)
     pygame.quit()
 
 if __name__ == "__main__":
+    sys.modules.setdefault('main', sys.modules[__name__])  # so modules that import main share this running game
     asyncio.run(main())
@@ -0,0 +1,46 @@
+# bits of a cell's turn mask, in the same order as the [right, left, up, down] turn lists
+RIGHT = 1
+LEFT = 2
+UP = 4
+DOWN = 8
+DIRECTION_BITS = (RIGHT, LEFT, UP, DOWN)
+# the [right, left, up, down] list each of the 16 possible masks stands for
+TURN_LISTS = tuple([bool(mask & bit) for bit in DIRECTION_BITS] for mask in range(16))
+
+
+def isWalkable(tile):  # blanks, dots and big dots can be walked on, walls and the gate (3 and up) can't
+    return tile < 3
+
+
+class Maze:  # the parts of a level that never change while it is played, worked out once per level
+    def __init__(self, level, turn_masks=None):  # turn_masks worked out before, like a compiled level pack's
+        self.level = level
+        self.rows = len(level)
+        self.cols = len(level[0]) if level else 0
+        if turn_masks is not None:
+            self.turn_masks = turn_masks
+            return
+        self.turn_masks = bytearray(self.rows * self.cols)  # one 4-bit mask per cell, stored row by row
+        for row in range(self.rows):
+            for col in range(self.cols):
+                self.turn_masks[row * self.cols + col] = self.findTurns(row, col)
+
+    def findTurns(self, row, col):
+        level = self.level
+        mask = 0
+        # leaving the board sideways wraps to the other edge, like the tunnel in the middle of the maze
+        if isWalkable(level[row][(col + 1) % self.cols]):
+            mask |= RIGHT
+        if isWalkable(level[row][(col - 1) % self.cols]):
+            mask |= LEFT
+        if row - 1 >= 0 and isWalkable(level[row - 1][col]):
+            mask |= UP
+        if row + 1 < self.rows and isWalkable(level[row + 1][col]):
+            mask |= DOWN
+        return mask
+
+    def readMask(self, row, col):
+        return self.turn_masks[row * self.cols + col]
+
+    def readTurns(self, row, col):  # [right, left, up, down], a fresh list the caller may keep
+        return TURN_LISTS[self.turn_masks[row * self.cols + col]][:]
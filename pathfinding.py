@@ -0,0 +1,249 @@
+import hashlib
+import os
+from array import array
+from collections import OrderedDict, deque
+from maze import DIRECTION_BITS, isWalkable
+
+UNREACHABLE = 0xFFFF  # distance stored for walls and tiles that can't be reached from the target
+NO_DIRECTION = 255    # next-hop stored when there is no way to the target
+TABLE_MAGIC = b'JMAP1'  # start of an all-pairs table cache file
+# the table takes 3 bytes for every pair of walkable tiles, so above this many tiles (48 MiB) boards get
+# DistanceFields instead. The classic board has a few hundred, a 256x256 arena tens of thousands
+MAX_TABLE_CELLS = 4096
+MAX_CACHED_TABLES = 8  # tables kept in memory, a level pack's boards take turns so a few are enough
+
+
+def stepFrom(row, col, direction, rows, cols):  # the tile one move away, with the same wrap as movement
+    if direction == 0:
+        return row, (col + 1) % cols
+    if direction == 1:
+        return row, (col - 1) % cols
+    if direction == 2:
+        return max(0, row - 1), col
+    return min(rows - 1, row + 1), col
+
+
+def findNearest(maze):  # nearest walkable cell index for every cell, breadth-first from all of them at once
+    rows, cols, level = maze.rows, maze.cols, maze.level
+    nearest = array('i', [-1]) * (rows * cols)
+    queue = deque()
+    for row in range(rows):
+        for col in range(cols):
+            if isWalkable(level[row][col]):
+                nearest[row * cols + col] = row * cols + col
+                queue.append((row, col))
+    while queue:  # walls are ignored here, this only finds which open tile a blocked target is closest to
+        row, col = queue.popleft()
+        for next_row, next_col in ((row, col + 1), (row, col - 1), (row - 1, col), (row + 1, col)):
+            if 0 <= next_row < rows and 0 <= next_col < cols and nearest[next_row * cols + next_col] == -1:
+                nearest[next_row * cols + next_col] = nearest[row * cols + col]
+                queue.append((next_row, next_col))
+    return nearest
+
+
+def snapTarget(maze, nearest, row, col):  # targets can land on walls or off the board, so use the closest open tile
+    row = max(0, min(row, maze.rows - 1))
+    col = max(0, min(col, maze.cols - 1))
+    return nearest[row * maze.cols + col]
+
+
+class DistanceFields:  # true maze distances to a target tile, one breadth-first search per target
+    def __init__(self, maze, max_cached=32):
+        self.maze = maze
+        self.max_cached = max_cached
+        self.fields = OrderedDict()  # target cell index -> distances, least recently used first
+        self.nearest = None  # nearest walkable cell index for every cell, built on first use
+
+    def snapTarget(self, row, col):
+        if self.nearest is None:
+            self.nearest = findNearest(self.maze)
+        return snapTarget(self.maze, self.nearest, row, col)
+
+    def distanceField(self, target_row, target_col):
+        # ghosts chasing the same tile share one field, and a field is only rebuilt once its target moves
+        # somewhere that isn't cached any more
+        target = self.snapTarget(target_row, target_col)
+        field = self.fields.get(target)
+        if field is not None:
+            self.fields.move_to_end(target)
+            return field
+
+        field = self.search(target)
+        self.fields[target] = field
+        if len(self.fields) > self.max_cached:
+            self.fields.popitem(last=False)
+        return field
+
+    def search(self, target):
+        rows, cols, masks = self.maze.rows, self.maze.cols, self.maze.turn_masks
+        field = array('H', [UNREACHABLE]) * (rows * cols)
+        if target < 0:
+            return field
+        field[target] = 0
+        queue = deque([target])
+        while queue:
+            cell = queue.popleft()
+            row, col = divmod(cell, cols)
+            mask = masks[cell]
+            for direction in range(4):
+                if mask & DIRECTION_BITS[direction]:
+                    next_row, next_col = stepFrom(row, col, direction, rows, cols)
+                    next_cell = next_row * cols + next_col
+                    if field[next_cell] == UNREACHABLE:
+                        field[next_cell] = field[cell] + 1
+                        queue.append(next_cell)
+        return field
+
+    def distance(self, row, col, target_row, target_col):
+        return self.distanceField(target_row, target_col)[row * self.maze.cols + col]
+
+    def bestDirection(self, row, col, target_row, target_col, turns_allowed):
+        # the allowed direction whose next tile is closest to the target along the maze, or -1
+        field = self.distanceField(target_row, target_col)
+        rows, cols = self.maze.rows, self.maze.cols
+        best_direction = -1
+        short_distance = UNREACHABLE
+        for direction in range(4):
+            if turns_allowed[direction]:
+                next_row, next_col = stepFrom(row, col, direction, rows, cols)
+                distance = field[next_row * cols + next_col]
+                if distance < short_distance:
+                    short_distance = distance
+                    best_direction = direction
+        return best_direction
+
+
+def layoutKey(maze):  # hash of which tiles are open, the only part of a board the table depends on
+    layout = bytes(1 if isWalkable(tile) else 0 for row in maze.level for tile in row)
+    return hashlib.sha256(b'%d,%d:' % (maze.rows, maze.cols) + layout).hexdigest()[:16]
+
+
+_tables = OrderedDict()  # tables already built in this process, keyed by layoutKey(), least recently used first
+
+
+def tableForMaze(maze, cache_dir=None):  # every new game copies the board, so reuse a table for the same layout
+    # a board too big for a table gets distance fields instead, which answer the same questions one target at a time
+    if sum(isWalkable(tile) for row in maze.level for tile in row) > MAX_TABLE_CELLS:
+        return DistanceFields(maze)
+    key = layoutKey(maze)
+    table = _tables.get(key)
+    if table is not None:
+        _tables.move_to_end(key)
+        return table
+    table = _tables[key] = AllPairsTable(maze, cache_dir)
+    if len(_tables) > MAX_CACHED_TABLES:
+        _tables.popitem(last=False)
+    return table
+
+
+class AllPairsTable:  # maze distance and first move between every pair of walkable tiles, built once per board
+    def __init__(self, maze, cache_dir=None):
+        self.maze = maze
+        self.nearest = findNearest(maze)
+        self.cells = [cell for cell in range(maze.rows * maze.cols) if self.nearest[cell] == cell]
+        self.nodes = array('i', [-1]) * (maze.rows * maze.cols)  # cell index -> position in self.cells
+        for node, cell in enumerate(self.cells):
+            self.nodes[cell] = node
+        self.size = len(self.cells)
+        self.distances = None   # size * size maze distances, row = from node, column = to node
+        self.directions = None  # size * size first move to make from one node towards another
+
+        # the table only depends on the layout, so it can be kept on disk between runs
+        path = os.path.join(cache_dir, f'paths-{layoutKey(maze)}.bin') if cache_dir else None
+        if not (path and self.load(path)):
+            self.build()
+            if path:
+                self.save(path)
+
+    def build(self):  # one breadth-first search per walkable tile, remembering which first move led where
+        rows, cols, masks = self.maze.rows, self.maze.cols, self.maze.turn_masks
+        size = self.size
+        self.distances = array('H', [UNREACHABLE]) * (size * size)
+        self.directions = bytearray([NO_DIRECTION]) * (size * size)
+        neighbours = []  # (direction, node) pairs reachable in one move from each node
+        for cell in self.cells:
+            row, col = divmod(cell, cols)
+            moves = []
+            for direction in range(4):
+                if masks[cell] & DIRECTION_BITS[direction]:
+                    next_row, next_col = stepFrom(row, col, direction, rows, cols)
+                    moves.append((direction, self.nodes[next_row * cols + next_col]))
+            neighbours.append(moves)
+
+        for source in range(size):
+            base = source * size
+            distances, directions = self.distances, self.directions
+            distances[base + source] = 0
+            queue = deque()
+            for direction, node in neighbours[source]:
+                if distances[base + node] == UNREACHABLE:
+                    distances[base + node] = 1
+                    directions[base + node] = direction
+                    queue.append(node)
+            while queue:
+                node = queue.popleft()
+                distance = distances[base + node] + 1
+                first_move = directions[base + node]
+                for _, next_node in neighbours[node]:
+                    if distances[base + next_node] == UNREACHABLE:
+                        distances[base + next_node] = distance
+                        directions[base + next_node] = first_move
+                        queue.append(next_node)
+
+    def load(self, path):
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return False
+        size = self.size
+        expected = len(TABLE_MAGIC) + size * size * 3
+        if len(data) != expected or not data.startswith(TABLE_MAGIC):
+            return False
+        start = len(TABLE_MAGIC)
+        self.distances = array('H')
+        self.distances.frombytes(data[start:start + size * size * 2])
+        self.directions = bytearray(data[start + size * size * 2:])
+        return True
+
+    def save(self, path):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(TABLE_MAGIC + self.distances.tobytes() + bytes(self.directions))
+        except OSError:
+            pass  # the cache is only a speed-up, the table is still usable without it
+
+    def distance(self, row, col, target_row, target_col):
+        cols = self.maze.cols
+        start = self.nodes[row * cols + col]
+        target = self.nodes[snapTarget(self.maze, self.nearest, target_row, target_col)]
+        if start < 0 or target < 0:
+            return UNREACHABLE
+        return self.distances[start * self.size + target]
+
+    def nextDirection(self, row, col, target_row, target_col):  # first move of a shortest path, or -1
+        cols = self.maze.cols
+        start = self.nodes[row * cols + col]
+        target = self.nodes[snapTarget(self.maze, self.nearest, target_row, target_col)]
+        if start < 0 or target < 0 or self.directions[start * self.size + target] == NO_DIRECTION:
+            return -1
+        return self.directions[start * self.size + target]
+
+    def bestDirection(self, row, col, target_row, target_col, turns_allowed):
+        # same choice as DistanceFields.bestDirection, read straight out of the table
+        rows, cols, size = self.maze.rows, self.maze.cols, self.size
+        target = self.nodes[snapTarget(self.maze, self.nearest, target_row, target_col)]
+        best_direction = -1
+        short_distance = UNREACHABLE
+        if target < 0:
+            return best_direction
+        for direction in range(4):
+            if turns_allowed[direction]:
+                next_row, next_col = stepFrom(row, col, direction, rows, cols)
+                node = self.nodes[next_row * cols + next_col]
+                distance = self.distances[node * size + target] if node >= 0 else UNREACHABLE
+                if distance < short_distance:
+                    short_distance = distance
+                    best_direction = direction
+        return best_direction
@@ -0,0 +1,194 @@
+import json
+import os
+import subprocess
+import sys
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # the drawing benchmarks need a display, but not a real window
+import pytest
+import main
+from simulation import Simulation
+
+# Timings of the hot paths, compared against performance_baselines.json. Each benchmark is recorded as a multiple
+# of calibrationLoop() timed in the same run, so the baselines carry over between machines and a busy machine
+# slows both sides alike. A benchmark fails when it is more than PERF_THRESHOLD (50% by default) slower than its
+# baseline. After a deliberate change record them again with `python performance_tests.py --update`.
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'performance_baselines.json')
+THRESHOLD = float(os.environ.get('PERF_THRESHOLD', '0.5'))
+
+
+def measure(function, number, repeat=5):
+    """Best time of one call in microseconds, over a few repeats to skip past noise."""
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e6
+
+
+def calibrationLoop():
+    """A fixed piece of plain Python, indexing and arithmetic like the game's rules do."""
+    cells = list(range(1024))
+    total = 0
+    for i in range(2000):
+        total += cells[i & 1023] * 3 % 7
+    return total
+
+
+def relativeTime(benchmark):
+    """The benchmark's time as a multiple of calibrationLoop()'s, timed either side of it to follow the machine."""
+    before = measure(calibrationLoop, number=100)
+    microseconds = benchmark()
+    after = measure(calibrationLoop, number=100)
+    return microseconds / min(before, after)
+
+
+def loadBaselines():
+    try:
+        with open(BASELINES) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def checkBaseline(name, relative):
+    baseline = loadBaselines().get(name)
+    if baseline is None:
+        pytest.skip(f'no baseline for {name}, record one with python performance_tests.py --update')
+    limit = baseline * (1 + THRESHOLD)
+    assert relative <= limit, f'{name} took {relative:.4g}x calibration, baseline {baseline:.4g}x (limit {limit:.4g}x)'
+
+
+def displayReady():
+    if main.surface is None:
+        main.initDisplay()
+
+
+def benchmarkSimulationTick():
+    """Microseconds per headless update(), playing a seeded game and starting again whenever it ends."""
+    simulation = Simulation(seed=0)
+
+    def tick():
+        if not simulation.step((simulation.ticks // 30) % 4):
+            simulation.reset(seed=0)
+    return measure(tick, number=2000)
+
+
+def benchmarkDrawGrid(eaten):
+    """Microseconds for drawGrid() to lay the board out again and draw it, with or without its pellets."""
+    displayReady()
+    main.newGame(seed=0)
+    if eaten:
+        for row in range(len(main.level)):
+            for col in range(len(main.level[row])):
+                if main.level[row][col] in (1, 2):
+                    main.eatPellet(row, col)
+
+    def draw():
+        main.invalidateBoard()
+        main.drawGrid()
+    return measure(draw, number=20)
+
+
+def benchmarkDrawGridCached():
+    """Microseconds for drawGrid() once the board layers exist, which is what every frame pays."""
+    displayReady()
+    main.newGame(seed=0)
+    main.drawGrid()
+    return measure(main.drawGrid, number=500)
+
+
+def benchmarkFindPath():
+    """Microseconds per Ghost.findPath() decision, every ghost chasing the player from where it spawned."""
+    main.newGame(seed=0)
+    ghosts = main.ghosts
+
+    def decide():
+        for ghost in ghosts:
+            ghost.turns_allowed = ghost.checkTurns()
+            ghost.findPath(main.player.readRow(), main.player.readCol())
+    return measure(decide, number=2000) / len(ghosts)
+
+
+def benchmarkCheckLevelComplete():
+    """Microseconds per check_level_complete() on a board that still has pellets."""
+    main.newGame(seed=0)
+    return measure(main.check_level_complete, number=20000)
+
+
+def benchmarkSwarmCollisions():
+    """Microseconds per Player.checkGhostCollisions() with 200 ghosts on the board."""
+    default = main.number_of_ghosts
+    main.number_of_ghosts = 200
+    try:
+        main.newGame(seed=0)
+    finally:
+        main.number_of_ghosts = default
+    return measure(main.player.checkGhostCollisions, number=2000)
+
+
+def benchmarkSwarmTick():
+    """Microseconds per update() with 200 ghosts deciding and moving."""
+    default = main.number_of_ghosts
+    main.number_of_ghosts = 200
+    try:
+        main.newGame(seed=0)
+    finally:
+        main.number_of_ghosts = default
+    main.player.lives = 10 ** 6  # keep the player in the game however often the swarm catches it
+    return measure(main.update, number=300)
+
+
+def benchmarkLevelTransition():
+    """Microseconds for reset_level() to lay out the next board of the pack, ready to play with its walls known."""
+    main.newGame(seed=0)
+
+    def transition():
+        main.reset_level()
+        main.currentMaze()
+    return measure(transition, number=200)
+
+
+def benchmarkColdStart():
+    """Microseconds from starting Python to the window being open with every sprite loaded."""
+    script = 'import main; main.initDisplay()'
+    environment = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    folder = os.path.dirname(os.path.abspath(__file__))
+
+    def start():
+        subprocess.run([sys.executable, '-c', script], cwd=folder, env=environment, check=True, stdout=subprocess.DEVNULL)
+    return measure(start, number=1, repeat=3)
+
+
+BENCHMARKS = {
+    'simulation_tick': benchmarkSimulationTick,
+    'draw_grid_full_board': lambda: benchmarkDrawGrid(eaten=False),
+    'draw_grid_empty_board': lambda: benchmarkDrawGrid(eaten=True),
+    'draw_grid_cached': benchmarkDrawGridCached,
+    'find_path': benchmarkFindPath,
+    'check_level_complete': benchmarkCheckLevelComplete,
+    'swarm_collisions': benchmarkSwarmCollisions,
+    'swarm_tick': benchmarkSwarmTick,
+    'level_transition': benchmarkLevelTransition,
+    'cold_start': benchmarkColdStart,
+}
+
+
+@pytest.mark.parametrize('name', BENCHMARKS)
+def test_performance_against_baseline(name):
+    """Performance Test: Verify each hot path is no slower than its recorded baseline allows."""
+    # Act
+    relative = relativeTime(BENCHMARKS[name])
+
+    # Assert
+    checkBaseline(name, relative)
+
+
+if __name__ == '__main__':
+    baselines = loadBaselines()
+    results = {name: relativeTime(benchmark) for name, benchmark in BENCHMARKS.items()}
+    for name, relative in results.items():
+        baseline = baselines.get(name)
+        compared = f'{relative / baseline:6.2f}x baseline' if baseline else 'no baseline'
+        print(f'{name:<24}{relative:12.4g}x calibration   {compared}')
+    if '--update' in sys.argv:
+        with open(BASELINES, 'w') as file:
+            json.dump({name: float(f'{relative:.4g}') for name, relative in results.items()}, file, indent=4)
+            file.write('\n')
+        print(f'baselines written to {BASELINES}')
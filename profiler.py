@@ -0,0 +1,75 @@
+import csv
+import time
+from collections import deque
+import pygame
+
+# the parts of a frame that are timed, in the order they happen
+PHASES = ('events', 'autopilot', 'checkTurns', 'movePlayer', 'checkCollisions', 'powerUp', 'checkGhostCollisions',
+          'check_level_complete', 'findPath', 'moveGhost', 'drawGrid', 'drawPlayer', 'drawGhosts', 'overlay', 'flip')
+OVERLAY_REFRESH = 30  # frames between redraws of the overlay text, rendering text every frame would show up in it
+
+
+class Profiler:  # adds up the time spent in each phase of a frame and keeps a rolling window of frames
+    def __init__(self, window=300):
+        self.history = {phase: deque(maxlen=window) for phase in PHASES + ('frame',)}  # milliseconds per frame
+        self.current = dict.fromkeys(PHASES, 0.0)  # seconds so far this frame
+        self.frames = []  # every finished frame, for writeCsv()
+        self.ticks = 0  # update() calls this frame
+        self.last = time.perf_counter()
+        self.frame_start = self.last
+        self.font = None
+        self.overlay = None
+
+    def mark(self):  # the time from here on counts towards the next lap
+        self.last = time.perf_counter()
+
+    def lap(self, phase):  # the time since the last mark or lap was spent in this phase
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def endFrame(self):
+        now = time.perf_counter()
+        frame = {phase: seconds * 1000 for phase, seconds in self.current.items()}
+        frame['frame'] = (now - self.frame_start) * 1000
+        for phase, milliseconds in frame.items():
+            self.history[phase].append(milliseconds)
+        frame['ticks'] = self.ticks
+        self.frames.append(frame)
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.ticks = 0
+        self.frame_start = self.last = now
+
+    def percentiles(self, phase):  # (p50, p99) in milliseconds over the rolling window
+        values = sorted(self.history[phase])
+        if not values:
+            return 0.0, 0.0
+        return values[len(values) // 2], values[min(len(values) - 1, len(values) * 99 // 100)]
+
+    def drawOverlay(self, surface):  # returns the screen area it covered
+        if self.overlay is None or len(self.frames) % OVERLAY_REFRESH == 0:
+            if self.font is None:
+                self.font = pygame.font.Font(None, 18)
+            lines = [f'{"phase":<21}{"p50":>7}{"p99":>7}']
+            for phase in PHASES + ('frame',):
+                p50, p99 = self.percentiles(phase)
+                lines.append(f'{phase:<21}{p50:7.2f}{p99:7.2f}')
+            line_height = self.font.get_linesize()
+            width = max(self.font.size(line)[0] for line in lines) + 8
+            self.overlay = pygame.Surface((width, line_height * len(lines) + 8))
+            self.overlay.fill((0, 0, 0))
+            for i, line in enumerate(lines):
+                # the default font isn't monospaced, so the numbers are right aligned in their own column
+                name, numbers = line[:21], line[21:]
+                self.overlay.blit(self.font.render(name, True, (255, 255, 255)), (4, 4 + i * line_height))
+                text = self.font.render(numbers, True, (255, 255, 255))
+                self.overlay.blit(text, (width - 4 - text.get_width(), 4 + i * line_height))
+        return surface.blit(self.overlay, (0, 0))
+
+    def writeCsv(self, path):  # one row per frame, milliseconds in each phase
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=('frame_number', 'ticks') + PHASES + ('frame',))
+            writer.writeheader()
+            for number, frame in enumerate(self.frames):
+                writer.writerow({'frame_number': number, **{key: round(value, 4) if isinstance(value, float) else value
+                                                            for key, value in frame.items()}})
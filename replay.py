@@ -0,0 +1,150 @@
+import argparse
+import bisect
+import struct
+import time
+from levels import choosePack, packHash
+
+# a recorded game is its seed, its starting speeds, the settings main.newGame() was given and every change of
+# direction_command with the tick it was made on. The rules only depend on those, so playing the changes back
+# headless reproduces the whole game. Every SNAPSHOT_INTERVAL ticks the whole game state is kept as well, so
+# seeking only replays from the last one.
+REPLAY_MAGIC = b'JREP7'
+HEADER = struct.Struct('<QBBIII')  # seed, player speed, ghost speed, ticks recorded, number of changes, of snapshots
+# ghosts, pathfinding (an index into main.PATHFINDING_MODES), levels.packHash() of the level pack, and the lengths
+# of the --levels path and --arena size it was loaded from, which follow
+SETTINGS = struct.Struct('<IB8sHH')
+CHANGE = struct.Struct('<IB')      # tick, new direction_command
+SNAPSHOT = struct.Struct('<II')    # tick, length of the main.GameState bytes that follow
+SNAPSHOT_INTERVAL = 600  # ten seconds of game time
+
+
+class Replay:
+    def __init__(self, seed, player_speed=7, ghost_speed=8, ghost_count=4, pathfinding='manhattan', levels=None,
+                 arena=None, pack=None):  # levels and arena are main.py's --levels and --arena, pack what they loaded
+        self.seed = seed
+        self.player_speed = player_speed
+        self.ghost_speed = ghost_speed
+        self.ghost_count = ghost_count
+        self.pathfinding = pathfinding
+        self.levels = levels
+        self.arena = arena
+        self.pack = pack
+        self.pack_hash = None  # of the pack the game was recorded on, once read back from a file
+        self.ticks = 0
+        self.changes = []  # (tick, direction_command) in tick order
+        self.snapshots = {}  # tick -> main.GameState taken just before that tick's update()
+        self.last_command = 0  # every game starts with the player heading right
+
+    def recordTick(self, direction_command, snapshot=None):
+        # called before each update() with the input it will use, and main.GameState.snapshot to take snapshots with
+        if direction_command != self.last_command:
+            self.changes.append((self.ticks, direction_command))
+            self.last_command = direction_command
+        if snapshot and self.ticks and self.ticks % SNAPSHOT_INTERVAL == 0:
+            self.snapshots[self.ticks] = snapshot()
+        self.ticks += 1
+
+    def levelPack(self):  # the pack to play on, loaded again like main.py did unless it's already here
+        if self.pack is None:
+            from main import LEVEL_CACHE_DIR
+            pack = choosePack(self.levels, self.arena, LEVEL_CACHE_DIR)
+            if self.pack_hash is not None and packHash(pack) != self.pack_hash:
+                raise ValueError(f'the level pack {self.levels or self.arena or "(classic board)"} has changed '
+                                 'since the game was recorded')
+            self.pack = pack
+        return self.pack
+
+    def toBytes(self):
+        from main import PATHFINDING_MODES
+        levels, arena = (self.levels or '').encode(), (self.arena or '').encode()
+        data = bytearray(REPLAY_MAGIC)
+        data += HEADER.pack(self.seed, self.player_speed, self.ghost_speed, self.ticks, len(self.changes), len(self.snapshots))
+        data += SETTINGS.pack(self.ghost_count, PATHFINDING_MODES.index(self.pathfinding), packHash(self.levelPack()),
+                              len(levels), len(arena))
+        data += levels + arena
+        for tick, direction_command in self.changes:
+            data += CHANGE.pack(tick, direction_command)
+        for tick, state in sorted(self.snapshots.items()):
+            state = state.toBytes()
+            data += SNAPSHOT.pack(tick, len(state)) + state
+        return bytes(data)
+
+    @classmethod
+    def fromBytes(cls, data):
+        from main import GameState, PATHFINDING_MODES
+        if not data.startswith(REPLAY_MAGIC):
+            raise ValueError('not a John-Man replay')
+        offset = len(REPLAY_MAGIC)
+        seed, player_speed, ghost_speed, ticks, count, snapshot_count = HEADER.unpack_from(data, offset)
+        offset += HEADER.size
+        ghost_count, pathfinding, pack_hash, levels_size, arena_size = SETTINGS.unpack_from(data, offset)
+        offset += SETTINGS.size
+        levels = bytes(data[offset:offset + levels_size]).decode() or None
+        offset += levels_size
+        arena = bytes(data[offset:offset + arena_size]).decode() or None
+        offset += arena_size
+        replay = cls(seed, player_speed, ghost_speed, ghost_count, PATHFINDING_MODES[pathfinding], levels, arena)
+        replay.pack_hash = pack_hash
+        replay.ticks = ticks
+        replay.changes = [CHANGE.unpack_from(data, offset + i * CHANGE.size) for i in range(count)]
+        replay.last_command = replay.changes[-1][1] if replay.changes else 0
+        offset += count * CHANGE.size
+        for _ in range(snapshot_count):
+            tick, length = SNAPSHOT.unpack_from(data, offset)
+            offset += SNAPSHOT.size
+            replay.snapshots[tick] = GameState.fromBytes(data[offset:offset + length])
+            offset += length
+        if offset != len(data):
+            raise ValueError('replay is truncated or has trailing data')
+        return replay
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(self.toBytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            return cls.fromBytes(file.read())
+
+    def play(self, simulation=None):  # re-runs the game headless as fast as it will go and returns its results
+        return self.seek(self.ticks, simulation).results()
+
+    def seek(self, tick, simulation=None):  # a simulation of the game as it was just before the given tick
+        # imported here so main.py can record replays without importing itself
+        from simulation import Simulation
+        simulation = simulation or Simulation()
+        simulation.reset(self.player_speed, self.ghost_speed, self.seed, self.levelPack(), self.ghost_count,
+                         self.pathfinding)
+        start = max((snapshot for snapshot in self.snapshots if snapshot <= tick), default=0)
+        if start:
+            self.snapshots[start].restore()
+            simulation.ticks = start
+        self.advance(simulation, min(tick, self.ticks))
+        return simulation
+
+    def advance(self, simulation, tick):  # steps the simulation on to the given tick with the recorded input
+        # the input in force is given every tick, not only when it changed, because the rules set direction_command
+        # back to right when the player is caught and a recorded game may have asked for the same direction again
+        index = bisect.bisect_right(self.changes, (simulation.ticks, 4))
+        direction_command = self.changes[index - 1][1] if index else 0
+        while simulation.ticks < tick and simulation.isRunning():
+            if index < len(self.changes) and self.changes[index][0] == simulation.ticks:
+                direction_command = self.changes[index][1]
+                index += 1
+            simulation.step(direction_command)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play a recorded John-Man game again without a window.')
+    parser.add_argument('path', help='a file saved by main.py --record')
+    parser.add_argument('--seek', type=int, default=None, help='stop at this tick instead of the end')
+    args = parser.parse_args()
+
+    replay = Replay.load(args.path)
+    start = time.perf_counter()
+    results = replay.seek(replay.ticks if args.seek is None else args.seek).results()
+    elapsed = time.perf_counter() - start
+    print(f'seed {replay.seed}, {replay.ghost_count} ghosts with {replay.pathfinding} pathfinding, {replay.ticks} ticks, '
+          f'{len(replay.changes)} inputs, {len(replay.snapshots)} snapshots, replayed in {elapsed * 1000:.0f} ms')
+    print(results)
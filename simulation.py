@@ -0,0 +1,45 @@
+import main
+
+
+class Simulation:  # steps the game rules in main.py without opening a window
+    # the rules keep their state in main's module globals, so a process runs one simulation at a time
+    def __init__(self, player_speed=7, ghost_speed=8, seed=None, pack=None, ghost_count=None, pathfinding=None):
+        self.ticks = 0
+        self.reset(player_speed, ghost_speed, seed, pack, ghost_count, pathfinding)
+
+    def reset(self, player_speed=7, ghost_speed=8, seed=None, pack=None, ghost_count=None, pathfinding=None):
+        # a seed makes the ghosts' random moves repeatable, the rest are main.newGame()'s settings
+        main.newGame(player_speed, ghost_speed, seed, pack, ghost_count, pathfinding)
+        self.ticks = 0
+
+    def step(self, direction_command=None):  # one game tick, returns False once the game is over
+        if direction_command is not None:
+            main.player.direction_command = direction_command
+        main.update()
+        self.ticks += 1
+        return main.running
+
+    def run(self, max_ticks, policy=None):  # policy(simulation) returns a direction command or None each tick
+        while main.running and self.ticks < max_ticks:
+            self.step(policy(self) if policy else None)
+        return self.results()
+
+    def readPlayer(self):
+        return main.player
+
+    def readGhosts(self):
+        return main.ghosts
+
+    def readLevel(self):
+        return main.level
+
+    def isRunning(self):
+        return main.running
+
+    def results(self):
+        return {
+            'score': main.player.points,
+            'levels_cleared': main.levels_cleared,
+            'lives_lost': main.levels_cleared + 3 - main.player.lives,  # each cleared level awards an extra life
+            'ticks': self.ticks,
+        }
@@ -0,0 +1,41 @@
+class TileIndex:  # which objects are on each tile, so finding the ones near a tile doesn't mean checking every one
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.buckets = [[] for _ in range(rows * cols)]  # objects on each cell, stored row by row
+        self.cells = {}  # object -> the cell it is filed under
+        self.ranks = {}  # object -> the order it was added in, near() keeps to it so results don't depend on buckets
+        self.added = 0
+
+    def __len__(self):
+        return len(self.cells)
+
+    def add(self, obj, row, col):
+        cell = row * self.cols + col
+        self.buckets[cell].append(obj)
+        self.cells[obj] = cell
+        self.ranks[obj] = self.added
+        self.added += 1
+
+    def move(self, obj, row, col):  # files an object under its new tile, objects that were never added are ignored
+        old = self.cells.get(obj)
+        cell = row * self.cols + col
+        if old is None or old == cell:
+            return
+        self.buckets[old].remove(obj)
+        self.buckets[cell].append(obj)
+        self.cells[obj] = cell
+
+    def rank(self, obj):
+        return self.ranks[obj]
+
+    def near(self, row, col):  # objects on the tile and the 8 around it, in the order they were added
+        found = []
+        for near_row in range(max(0, row - 1), min(self.rows, row + 2)):
+            start = near_row * self.cols
+            for cell in range(start + max(0, col - 1), start + min(self.cols, col + 2)):
+                if self.buckets[cell]:
+                    found += self.buckets[cell]
+        if len(found) > 1:
+            found.sort(key=self.ranks.__getitem__)
+        return found
@@ -123,4 +123,166 @@ def test_level_completion_resets_and_increases_speed(game_subsystem_setup):
     # 3. Player and ghosts are reset to their starting positions
     assert (player.readRow(), player.readCol()) == (18, 15)
     assert (ghosts[0].readRow(), ghosts[0].readCol()) == (2, 2)
-    assert (ghosts[1].readRow(), ghosts[1].readCol()) == (2, 27)
\ No newline at end of file
+    assert (ghosts[1].readRow(), ghosts[1].readCol()) == (2, 27)
+
+def test_pellet_count_tracks_eaten_pellets(game_globals, game_subsystem_setup):
+    """Test that the remaining pellet count follows the player eating pellets and resets with the level."""
+    player, _, level = game_subsystem_setup
+    initial_count = main.remainingPellets()
+    assert initial_count == sum(row.count(1) + row.count(2) for row in level)
+
+    # Act: Eat a dot and a big dot.
+    set_pos(player, 2, 2)
+    player.checkCollisions()
+    set_pos(player, 4, 2)
+    player.checkCollisions()
+
+    # Assert: Two fewer pellets, and standing on an empty tile doesn't change the count.
+    assert main.remainingPellets() == initial_count - 2
+    player.checkCollisions()
+    assert main.remainingPellets() == initial_count - 2
+
+    # A reset restores the full count.
+    main.reset_level()
+    assert main.remainingPellets() == initial_count
+
+
+def test_game_state_snapshot_and_restore(game_globals, game_subsystem_setup):
+    """Test that restoring a GameState puts back the board, the pellet count and every entity."""
+    player, ghosts, level = game_subsystem_setup
+    main.seedRandom(7)
+    set_pos(player, 2, 2)
+    player.checkCollisions()
+    board = [row[:] for row in level]
+    state = main.GameState.snapshot()
+
+    # Act: Eat another pellet, move everything and lose a life, then go back.
+    set_pos(player, 4, 2)
+    player.checkCollisions()
+    set_pos(ghosts[0], 10, 10)
+    player.lives -= 1
+    main.rng.random()
+    state.restore()
+
+    # Assert: Everything is back the way it was, in the same level list.
+    assert main.level is level
+    assert level == board
+    assert main.remainingPellets() == sum(row.count(1) + row.count(2) for row in level)
+    assert (player.readRow(), player.readCol(), player.lives) == (2, 2, 3)
+    assert (ghosts[0].readRow(), ghosts[0].readCol()) == (2, 2)
+    assert main.GameState.snapshot() == state
+    assert main.GameState.fromBytes(state.toBytes()) == state
+
+
+def test_batched_ghost_update_matches_each_ghost_on_its_own(game_globals):
+    """Test that updateGhosts() plays out exactly like every ghost deciding and moving by itself."""
+    main.newGame(seed=3, ghost_count=12)
+    start = main.GameState.snapshot()
+
+    def eachGhost():
+        for ghost in main.ghosts:
+            ghost.turns_allowed = ghost.checkTurns()
+            if main.counter % (4 + ghost.character) == 0:
+                ghost.findPath(main.player.readRow(), main.player.readCol())
+            ghost.moveGhost()
+
+    # Act: The same 400 ticks of ghost moves, fleeing and then chasing, batched and then one ghost at a time
+    for tick in range(400):
+        main.counter = tick % 16
+        main.player.power = tick < 200
+        main.updateGhosts()
+    batched = main.GameState.snapshot()
+    start.restore()
+    for tick in range(400):
+        main.counter = tick % 16
+        main.player.power = tick < 200
+        eachGhost()
+
+    # Assert
+    assert batched != start
+    assert main.GameState.snapshot() == batched
+
+
+def test_level_pack_boards_are_played_in_turn(game_globals):
+    """Test that clearing a level lays out the pack's next board, and snapshots go back to the board they were on."""
+    from levels import compilePack
+    second = [row[:] for row in original_boards]
+    second[2] = [0 if tile == 1 else tile for tile in second[2]]  # the top corridor without its dots
+    pack = compilePack([{'name': 'Classic', 'tiles': original_boards}, {'name': 'Bare top', 'tiles': second}])
+    main.newGame(seed=0, pack=pack)
+    first_level = main.level
+    on_first = main.GameState.snapshot()
+
+    # Act: Eat every pellet of the first board, then take a snapshot on the second
+    for row in range(len(first_level)):
+        for col in range(len(first_level[row])):
+            if first_level[row][col] in (1, 2):
+                main.eatPellet(row, col)
+    cleared = check_level_complete()
+    on_second = main.GameState.snapshot()
+
+    # Assert: The second board is laid out with its own walls and pellet count
+    assert cleared and main.currentBoard() is pack[1]
+    assert main.level == second and main.level is not first_level
+    assert main.remainingPellets() == pack[1].pellets == pack[0].pellets - original_boards[2].count(1)
+    assert main.currentMaze().turn_masks is pack[1].turn_masks
+    # Going back to the first board swaps its list back in, and a saved second board state is laid out again
+    on_first.restore()
+    assert main.level is first_level and main.level == original_boards
+    main.GameState.fromBytes(on_second.toBytes()).restore()
+    assert main.level == second and main.remainingPellets() == pack[1].pellets
+
+
+def test_game_runs_on_a_board_of_its_own_size(game_globals):
+    """Test that a board of another size brings its own bounds and spawn points to movement, targeting and respawns."""
+    from levels import compilePack, generateArena
+    pack = compilePack([generateArena(41, 56, seed=5)])
+
+    # Act
+    main.newGame(seed=0, pack=pack)
+    player, ghosts = main.player, main.ghosts
+
+    # Assert: Everything starts on the new board's spawns, and the ghost index covers the whole board
+    assert (main.board_rows, main.board_cols) == (41, 56)
+    assert (player.readRow(), player.readCol()) == pack[0].player_spawn
+    assert [(ghost.readRow(), ghost.readCol()) for ghost in ghosts] == list(pack[0].ghost_spawns)
+    assert main.ghostIndex().near(39, 53) == [ghosts[3]]
+    # Pinky's ambush point is clamped to this board's bottom row, not the classic board's
+    set_pos(player, 39, 27)
+    player.direction = 3
+    assert ghosts[1].findTarget(39, 27, None)[:2] == (40, 27)
+    # An eaten ghost goes back to its own spawn here, and a caught player to theirs
+    player.power = True
+    set_pos(ghosts[3], 39, 27)
+    player.checkGhostCollisions()
+    assert (ghosts[3].readRow(), ghosts[3].readCol()) == (39, 53)
+    player.power = False
+    set_pos(ghosts[0], 39, 27)
+    player.checkGhostCollisions()
+    assert (player.readRow(), player.readCol(), player.lives) == (19, 27, 2)
+
+
+def test_restoring_across_boards_of_different_sizes(game_globals):
+    """Test that going back to a snapshot on a board of another size takes on that board's size again."""
+    from levels import compilePack, generateArena
+    pack = compilePack([{'name': 'Classic', 'tiles': original_boards}, generateArena(41, 51)])
+    main.newGame(seed=0, pack=pack)
+    on_classic = main.GameState.snapshot()
+    for row, col in [(row, col) for row in range(32) for col in range(30) if main.level[row][col] in (1, 2)]:
+        main.eatPellet(row, col)
+    check_level_complete()
+    on_arena = (main.board_rows, main.board_cols)
+
+    # Act: Go back to the classic board, then walk the player right through the tunnel
+    on_classic.restore()
+    main.player.power = True  # the ghosts can't end the walk
+    set_pos(main.player, 15, 27)
+    main.player.direction_command = main.player.direction = 0
+    for _ in range(60):
+        main.update()
+
+    # Assert: The bounds, the ghost index and the walk all follow the classic board
+    assert on_arena == (41, 51)
+    assert (main.board_rows, main.board_cols) == (32, 30)
+    assert (main.ghostIndex().rows, main.ghostIndex().cols) == (32, 30)
+    assert main.player.readRow() == 15 and main.player.readCol() < 30
@@ -122,4 +122,244 @@ def test_game_over_system(game_system_setup):
     player.checkGhostCollisions()
 
     # Assert: The global 'running' flag in the game module should be set to False.
-    assert main.running is False
\ No newline at end of file
+    assert main.running is False
+
+def test_headless_simulation_system(game_globals):
+    """
+    System Test: Verify the game rules can be stepped without a display
+    and that the player moves through the maze until it meets a wall.
+    """
+    from simulation import Simulation
+
+    # Arrange: Start a fresh game with the player heading left along the corridor below the ghost box.
+    simulation = Simulation(player_speed=7, ghost_speed=8)
+
+    # Act: Step the rules for a few seconds of game time.
+    for _ in range(120):
+        simulation.step(1)
+
+    # Assert: The player stopped at the end of the corridor, and no window was ever opened.
+    results = simulation.results()
+    assert results['ticks'] == 120
+    assert results['lives_lost'] == 0
+    assert (main.player.readRow(), main.player.readCol()) == (18, 10)
+    assert pygame.display.get_surface() is None
+
+
+def test_tournament_runs_games_in_worker_processes(game_globals):
+    """
+    System Test: Verify the tournament runner plays every combination of settings
+    in worker processes and reports each game's results.
+    """
+    from tournament import makeJobs, runTournament
+
+    # Arrange: Two seeds for each of two policies, short enough to finish quickly.
+    jobs = makeJobs([0, 1], [7], [8], ['idle', 'greedy'], 300)
+
+    # Act: Play them across two worker processes without printing.
+    results = list(runTournament(jobs, workers=2, output=None))
+
+    # Assert: Every game came back once, and the greedy bot ate pellets the idle player never reaches.
+    assert sorted((result['policy'], result['seed']) for result in results) == [
+        ('greedy', 0), ('greedy', 1), ('idle', 0), ('idle', 1)]
+    assert all(result['ticks'] <= 300 for result in results)
+    assert all(result['score'] > 0 for result in results if result['policy'] == 'greedy')
+    assert all(result['score'] == 0 for result in results if result['policy'] == 'idle')
+
+
+def test_replay_reproduces_recorded_game(game_globals):
+    """
+    System Test: Verify a recorded game plays out exactly the same when its replay
+    is saved, loaded and simulated again without a display.
+    """
+    import random
+    from replay import Replay
+    from simulation import Simulation
+
+    # Arrange: Play a seeded game with changing input, recording it like the game loop does.
+    inputs = random.Random(5)
+    simulation = Simulation(seed=1234)
+    recording = Replay(1234)
+    for tick in range(2000):
+        if tick % 25 == 0:
+            main.player.direction_command = inputs.randrange(4)
+        recording.recordTick(main.player.direction_command)
+        if not simulation.step():
+            break
+    expected = simulation.results()
+    expected_positions = [(obj.readRow(), obj.readCol()) for obj in [main.player] + main.ghosts]
+
+    # Act: Round trip the replay through its file format and play it back.
+    replay = Replay.fromBytes(recording.toBytes())
+    results = replay.play()
+
+    # Assert: Same outcome, and everything ended up on the same tiles.
+    assert results == expected
+    assert [(obj.readRow(), obj.readCol()) for obj in [main.player] + main.ghosts] == expected_positions
+    assert len(recording.toBytes()) < 600
+
+
+def test_replay_seek_matches_playing_from_the_start(game_globals, monkeypatch):
+    """
+    System Test: Verify seeking a replay restores the nearest snapshot and simulates
+    forward to exactly the state a full playback reaches.
+    """
+    import replay as replay_module
+    from replay import Replay
+    from simulation import Simulation
+
+    # Arrange: Record a game with a snapshot every 50 ticks, keeping the state at tick 130.
+    monkeypatch.setattr(replay_module, 'SNAPSHOT_INTERVAL', 50)
+    simulation = Simulation(seed=99)
+    recording = Replay(99)
+    for tick in range(200):
+        main.player.direction_command = (tick // 40) % 4
+        recording.recordTick(main.player.direction_command, main.GameState.snapshot)
+        if tick == 130:
+            expected = main.GameState.snapshot()
+        simulation.step()
+    replay = Replay.fromBytes(recording.toBytes())
+
+    # Act: Seek straight to tick 130, which starts from the snapshot at tick 100.
+    seeked = replay.seek(130)
+
+    # Assert: Snapshots were kept, and the seek landed on the same state as the original game.
+    assert sorted(replay.snapshots) == [50, 100, 150]
+    assert seeked.ticks == 130
+    assert main.GameState.snapshot() == expected
+
+
+
+def test_replay_keeps_the_settings_it_was_recorded_with(game_globals, monkeypatch, tmp_path):
+    """
+    System Test: Verify a replay plays back on the board, ghosts and pathfinding it was
+    recorded with, whatever the game playing it back was set up with, and refuses a
+    level pack that has changed since.
+    """
+    import replay as replay_module
+    from levels import builtinPack, choosePack
+    from replay import Replay
+    from simulation import Simulation
+
+    # Arrange: Record a game of 8 ghosts finding their way by breadth-first search on a generated arena.
+    monkeypatch.setattr(replay_module, 'SNAPSHOT_INTERVAL', 100)
+    monkeypatch.setattr(main, 'LEVEL_CACHE_DIR', str(tmp_path / 'cache'))
+    pack = choosePack(arena='21x25')
+    simulation = Simulation(seed=8, pack=pack, ghost_count=8, pathfinding='bfs')
+    recording = Replay(8, ghost_count=8, pathfinding='bfs', arena='21x25', pack=pack)
+    for tick in range(400):
+        main.player.direction_command = (tick // 30) % 4
+        recording.recordTick(main.player.direction_command, main.GameState.snapshot)
+        if not simulation.step():
+            break
+    expected = main.GameState.snapshot()
+    data = recording.toBytes()
+    main.newGame(seed=8, pack=builtinPack(), ghost_count=4, pathfinding='manhattan')
+
+    # Act: Play it back from the file, in a process now set up for the classic game.
+    replay = Replay.fromBytes(data)
+    replay.play()
+
+    # Assert: The recorded settings were used, so the game ended up exactly where it did.
+    assert (replay.ghost_count, replay.pathfinding, replay.arena, replay.levels) == (8, 'bfs', '21x25', None)
+    assert (main.board_rows, main.board_cols, len(main.ghosts)) == (21, 25, 8)
+    assert main.GameState.snapshot() == expected
+    # A pack file edited after recording is reported instead of playing out differently
+    pack_path = tmp_path / 'pack.txt'
+    pack_path.write_text('\n'.join(''.join(map(str, row)) for row in original_boards))
+    data = Replay(8, levels=str(pack_path)).toBytes()
+    pack_path.write_text(pack_path.read_text().replace('1', '0', 1))
+    with pytest.raises(ValueError, match='has changed since the game was recorded'):
+        Replay.fromBytes(data).play()
+
+def test_big_arena_window_stays_within_bounds(game_globals):
+    """
+    System Test: Verify a board too big to show at full size opens a window no bigger than
+    MAX_WINDOW_SIZE, with board layers to match, and still draws and eats pellets.
+    """
+    from levels import choosePack
+
+    # Arrange: A 256x256 arena, which at full size would need a window over 7000 pixels across.
+    main.newGame(seed=0, pack=choosePack(arena='256x256'))
+
+    # Act: Open the window, draw a frame, then eat a pellet and draw the frame that changes.
+    main.initDisplay()
+    main.dirty_rect_mode = True
+    try:
+        assert main.drawDirty() is None
+        row, col = next((i, j) for i, line in enumerate(main.level) for j, tile in enumerate(line) if tile == 1)
+        main.level[row][col] = 0
+        main.erasePellet(row, col)
+        changed = main.drawDirty()
+
+        # Assert: The window and its layers fit the bounds and the eaten pellet's area was repainted.
+        width, height = main.screen.get_size()
+        assert width <= main.MAX_WINDOW_SIZE[0] and height <= main.MAX_WINDOW_SIZE[1]
+        assert (width, height) == (main.board_cols * main.tile_pixels, main.board_rows * main.tile_pixels)
+        assert main.maze_surface.get_size() == main.pellet_surface.get_size() == (width, height)
+        assert any(rect.collidepoint(col * main.tile_pixels, row * main.tile_pixels) for rect in changed)
+    finally:
+        pygame.quit()
+
+def test_autopilot_searches_without_changing_the_game(game_globals):
+    """
+    System Test: Verify the autopilot's lookahead leaves the real game untouched
+    and that steering with it collects pellets.
+    """
+    from autopilot import Autopilot
+    from simulation import Simulation
+
+    # Arrange: A seeded game and a bot with a generous budget so the test doesn't depend on machine speed.
+    simulation = Simulation(seed=3)
+    pilot = Autopilot(budget=0.05, max_depth=3)
+    before = main.GameState.snapshot()
+
+    # Act: Make one decision, then let the bot play for a while.
+    direction = pilot.decide()
+    after = main.GameState.snapshot()
+    results = simulation.run(300, lambda simulation: pilot.steer())
+
+    # Assert: The search put everything back, picked a legal move, and the bot scored.
+    assert after == before
+    assert main.currentMaze().readTurns(18, 15)[direction]
+    assert pilot.nodes > 0
+    assert results['score'] > 0
+
+
+def test_environments_step_headless_games(game_globals):
+    """
+    System Test: Verify the training environments return observations, rewards and done flags,
+    and that two single-game environments can take turns in one process without mixing up their games.
+    """
+    import numpy as np
+    from environment import BatchEnv, GameEnv, CHANNELS, PLAYER, WALLS
+
+    # Arrange: The same seeded game twice, once alone and once interleaved with a different game.
+    def play(env, steps, other=None):
+        env.reset()
+        total = 0
+        for step in range(steps):
+            if other is not None:
+                other.step(step % 4)
+            observation, reward, done, info = env.step(3 if step < 40 else 1)
+            total += reward
+        return observation, total, info
+
+    # Act
+    alone = play(GameEnv(seed=11), 200)
+    other = GameEnv(seed=12)
+    other.reset()
+    shared = play(GameEnv(seed=11), 200, other)
+    batch = BatchEnv(8, seed=0)
+    batch_observation = batch.reset()
+    batch_observation, rewards, dones, infos = batch.step(np.full(8, 1))
+
+    # Assert: Identical games either way, with one player and the board's walls in every observation.
+    assert np.array_equal(alone[0], shared[0])
+    assert alone[1:] == shared[1:]
+    assert alone[0].shape == (len(CHANNELS), 32, 30)
+    assert alone[0][PLAYER].sum() == 1
+    assert batch_observation.shape == (8, len(CHANNELS), 32, 30)
+    assert (batch_observation[:, PLAYER].sum(axis=(1, 2)) == 1).all()
+    assert (batch_observation[:, WALLS] == alone[0][WALLS]).all()
+    assert rewards.shape == dones.shape == (8,)
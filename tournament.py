@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from levels import choosePack
+from maze import DIRECTION_BITS
+from pathfinding import stepFrom
+import main
+from simulation import Simulation
+
+# plays many headless games at once, one per worker process, and prints each result as a line of JSON as soon
+# as its game ends. main.py keeps the game in module globals, so every worker process plays one game at a time.
+
+
+def idlePolicy(seed):  # never touches the controls, the player keeps going right until a wall stops it
+    return None
+
+
+def randomPolicy(seed):  # a new random direction every 30 ticks, from its own generator so the ghosts aren't affected
+    rng = random.Random(seed)
+
+    def policy(simulation):
+        return rng.randrange(4) if simulation.ticks % 30 == 0 else None
+    return policy
+
+
+def greedyPolicy(seed):  # heads for the nearest pellet along the maze, worked out again on every new tile
+    last_key, last_move = None, None  # the tile, level and pellet count the move was last worked out for
+
+    def policy(simulation):
+        nonlocal last_key, last_move
+        player = simulation.readPlayer()
+        maze = main.currentMaze()
+        start = player.readRow() * maze.cols + player.readCol()
+        # the answer only changes once the player reaches another tile or a pellet is eaten
+        key = (id(maze), main.levels_cleared, start, main.remainingPellets())
+        if key != last_key:
+            last_key, last_move = key, nearestPellet(maze, simulation.readLevel(), start)
+        return last_move
+    return policy
+
+
+def nearestPellet(maze, level, start):  # the first move on the shortest way from a cell to a pellet, or None
+    first_moves = {start: None}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        row, col = divmod(cell, maze.cols)
+        if level[row][col] in (1, 2):
+            return first_moves[cell]
+        for direction in range(4):
+            if maze.turn_masks[cell] & DIRECTION_BITS[direction]:
+                next_row, next_col = stepFrom(row, col, direction, maze.rows, maze.cols)
+                next_cell = next_row * maze.cols + next_col
+                if next_cell not in first_moves:
+                    first_moves[next_cell] = direction if first_moves[cell] is None else first_moves[cell]
+                    queue.append(next_cell)
+    return None
+
+
+def autopilotPolicy(seed):  # the beam search bot from autopilot.py, with its default time budget
+    from autopilot import Autopilot
+    pilot = Autopilot()
+    return lambda simulation: pilot.steer()
+
+
+POLICIES = {'idle': idlePolicy, 'random': randomPolicy, 'greedy': greedyPolicy, 'autopilot': autopilotPolicy}
+
+
+def playGame(seed, player_speed, ghost_speed, policy_name, max_ticks):  # runs in a worker process
+    simulation = Simulation(player_speed, ghost_speed, seed)
+    start = time.perf_counter()
+    results = simulation.run(max_ticks, POLICIES[policy_name](seed))
+    return {
+        'seed': seed,
+        'player_speed': player_speed,
+        'ghost_speed': ghost_speed,
+        'policy': policy_name,
+        **results,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def makeJobs(seeds, player_speeds, ghost_speeds, policies, max_ticks):  # every combination of the settings
+    return [(seed, player_speed, ghost_speed, policy, max_ticks)
+            for player_speed in player_speeds
+            for ghost_speed in ghost_speeds
+            for policy in policies
+            for seed in seeds]
+
+
+def setUpWorker(levels, arena, ghost_count, pathfinding):  # the settings every game of the tournament is played with
+    main.newGame(pack=choosePack(levels, arena, main.LEVEL_CACHE_DIR), ghost_count=ghost_count, pathfinding=pathfinding)
+
+
+def runTournament(jobs, workers=None, output=sys.stdout, levels=None, arena=None, ghost_count=4, pathfinding='manhattan'):
+    # yields each game's results in the order they finish
+    with ProcessPoolExecutor(max_workers=workers, initializer=setUpWorker,
+                             initargs=(levels, arena, ghost_count, pathfinding)) as pool:
+        futures = [pool.submit(playGame, *job) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            if output is not None:
+                output.write(json.dumps(result) + '\n')
+                output.flush()
+            yield result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play many headless John-Man games across all CPU cores.')
+    parser.add_argument('--games', type=int, default=100, help='games per combination of speeds and policies')
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--player-speeds', type=int, nargs='+', default=[7])
+    parser.add_argument('--ghost-speeds', type=int, nargs='+', default=[8])
+    parser.add_argument('--policies', nargs='+', choices=sorted(POLICIES), default=['random'])
+    parser.add_argument('--max-ticks', type=int, default=20000, help='stop a game that is still going after this')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--levels', help='a level pack file to play instead of the classic board')
+    parser.add_argument('--arena', help='a generated board of this size to play instead, like 64x64')
+    parser.add_argument('--ghosts', type=int, default=4)
+    parser.add_argument('--pathfinding', choices=main.PATHFINDING_MODES, default='manhattan')
+    args = parser.parse_args()
+
+    seeds = range(args.first_seed, args.first_seed + args.games)
+    jobs = makeJobs(seeds, args.player_speeds, args.ghost_speeds, args.policies, args.max_ticks)
+    start = time.perf_counter()
+    scores = [result['score'] for result in runTournament(jobs, args.workers, sys.stdout, args.levels, args.arena,
+                                                                  args.ghosts, args.pathfinding)]
+    print(f'{len(scores)} games in {time.perf_counter() - start:.1f} s with {args.workers} workers, '
+          f'mean score {sum(scores) / max(1, len(scores)):.1f}', file=sys.stderr)
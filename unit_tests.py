@@ -187,4 +187,375 @@ def test_increase_speed_stops_at_minimum(monkeypatch):
 
     # Assert
     assert mock_player.player_speed == 3
-    assert mock_ghost.speed == 3
\ No newline at end of file
+    assert mock_ghost.speed == 3
+
+def test_player_drawn_between_tiles(game_globals, game_objects, monkeypatch):
+    """Unit test for drawing a moving player partway between its previous tile and its current one."""
+    player, _ = game_objects
+    monkeypatch.setattr('main.tick_alpha', 0.5)
+
+    # Arrange: The player has just stepped one tile right and is 3 of its 7 ticks into the next move
+    player.previous_row, player.previous_col = 1, 1
+    player._Object__col = 2
+    player._Object__xPos = 2 * TILEWIDTH
+    player.move_counter = 3
+
+    # Act
+    draw_pos = player.readDrawPos()
+
+    # Assert: Half way through the move, so half a tile short of the new tile
+    assert draw_pos == (round(1.5 * TILEWIDTH), 1 * TILEHEIGHT)
+
+    # Arrange 2: Wrapped through the tunnel from the left edge to the right edge
+    player.previous_col = 0
+    player._Object__col = 29
+    player._Object__xPos = 29 * TILEWIDTH
+
+    # Assert 2: Not slid across the whole screen, just drawn on the new tile
+    assert player.readDrawPos() == (29 * TILEWIDTH, 1 * TILEHEIGHT)
+
+
+def test_maze_turn_masks():
+    """Unit test for the precomputed turn masks of a level, including the tunnel wrap."""
+    from maze import Maze
+
+    # Arrange
+    maze = Maze([row[:] for row in original_boards])
+
+    # Act / Assert: An open intersection allows every direction
+    assert maze.readTurns(6, 7) == [True, True, True, True]
+
+    # A corner of the maze only opens right and down
+    assert maze.readTurns(2, 2) == [True, False, False, True]
+
+    # The tunnel entrance on the left edge wraps around to the right edge
+    assert maze.readTurns(15, 0) == [True, True, False, False]
+    assert maze.readTurns(15, 29) == [True, True, False, False]
+
+
+def test_all_pairs_table_matches_breadth_first_search(tmp_path):
+    """Unit test for the all-pairs shortest path table and its on-disk cache."""
+    from maze import Maze
+    from pathfinding import AllPairsTable, DistanceFields
+
+    # Arrange
+    maze = Maze([row[:] for row in original_boards])
+    fields = DistanceFields(maze)
+
+    # Act: Build the table once, then load it back from the cache file it wrote
+    table = AllPairsTable(maze, tmp_path)
+    cached = AllPairsTable(maze, tmp_path)
+
+    # Assert: Distances match a fresh search, including through the tunnel
+    assert table.distance(2, 13, 2, 16) == fields.distance(2, 13, 2, 16) == 11
+    assert table.distance(15, 0, 15, 29) == 1
+    # The first move of the path heads down and around the wall in the way
+    assert table.nextDirection(2, 13, 2, 16) == 3
+    # The cached copy is identical
+    assert cached.distances == table.distances
+    assert cached.directions == table.directions
+
+
+def test_big_boards_fall_back_from_the_all_pairs_table(monkeypatch):
+    """Unit test for boards too big for an all-pairs table, and the bound on tables kept in memory."""
+    import pathfinding
+    from levels import generateArena
+    from maze import Maze
+    from pathfinding import AllPairsTable, DistanceFields, tableForMaze
+    monkeypatch.setattr(pathfinding, '_tables', pathfinding.OrderedDict())
+    monkeypatch.setattr(pathfinding, 'MAX_CACHED_TABLES', 2)
+    classic = Maze([row[:] for row in original_boards])
+
+    # Act: A table for the classic board, one for a board over the limit, then more layouts than are kept
+    table = tableForMaze(classic)
+    monkeypatch.setattr(pathfinding, 'MAX_TABLE_CELLS', 400)
+    big = tableForMaze(Maze(generateArena(41, 41)['tiles']))
+    for size in (9, 11, 13):
+        tableForMaze(Maze(generateArena(size, size)['tiles']))
+
+    # Assert: The big board gets distance fields that answer like a table, and only the newest tables stay
+    assert isinstance(table, AllPairsTable) and isinstance(big, DistanceFields)
+    assert big.distance(1, 1, 1, 1) == 0
+    assert len(pathfinding._tables) == 2 and tableForMaze(classic) is not table
+
+
+def test_batch_simulator_moves_every_game():
+    """Unit test for the vectorised batch simulator's player movement."""
+    import numpy as np
+    from batch import BatchSimulator
+
+    # Arrange
+    simulator = BatchSimulator(3, seed=0)
+
+    # Act: Send every game left from the start tile, the first move happens on the 7th tick
+    for _ in range(7):
+        simulator.step(np.full(3, 1))
+
+    # Assert: Every game moved one tile left and is still running
+    assert (simulator.player_row == 18).all()
+    assert (simulator.player_col == 14).all()
+    assert (simulator.direction == 1).all()
+    assert simulator.running.all()
+
+
+def test_batch_simulator_plays_the_pack_and_ghosts_it_is_given():
+    """Unit test for the batch simulator taking its board and ghost count from a compiled pack instead of fixed ones."""
+    import numpy as np
+    from batch import BatchSimulator
+    from levels import builtinPack, compilePack, generateArena
+    pack = compilePack([generateArena(21, 25)])
+
+    # Act: Eight ghosts, two of every character, on a generated board
+    simulator = BatchSimulator(3, seed=0, pack=pack, ghost_count=8)
+    simulator.run(200)
+
+    # Assert: The games are laid out on that board with every ghost starting in its character's corner
+    board = pack[0]
+    assert (simulator.rows, simulator.cols) == (board.rows, board.cols)
+    assert simulator.ghost_row.shape == (8, 3)
+    assert simulator.ghost_corners.tolist() == [list(board.ghost_spawns[ghost % 4]) for ghost in range(8)]
+    assert (simulator.start_tiles == np.frombuffer(bytes(board.tiles), dtype=np.uint8)).all()
+    assert (simulator.ticks > 0).all()
+    # Settings it can't play are refused rather than played as something else
+    with pytest.raises(ValueError, match='a pack of one board'):
+        BatchSimulator(3, pack=builtinPack() + pack)
+    with pytest.raises(ValueError, match='pathfinding'):
+        BatchSimulator(3, pathfinding='bfs')
+
+def test_profiler_times_update_phases(game_globals, tmp_path, monkeypatch):
+    """Unit test for the per-phase profiler fed by update()."""
+    import csv
+    import main
+    from profiler import Profiler, PHASES
+    from simulation import Simulation
+
+    # Arrange
+    simulation = Simulation(seed=0)
+    profiler = Profiler()
+    monkeypatch.setattr(main, 'profiler', profiler)
+
+    # Act: Two frames of three ticks each, then save them
+    for _ in range(2):
+        profiler.mark()
+        for _ in range(3):
+            simulation.step()
+        profiler.endFrame()
+    profiler.writeCsv(tmp_path / 'frames.csv')
+
+    # Assert: Every tick was counted and timed, and the CSV has a column per phase
+    p50, p99 = profiler.percentiles('movePlayer')
+    assert 0 < p50 <= p99
+    with open(tmp_path / 'frames.csv') as file:
+        rows = list(csv.DictReader(file))
+    assert [row['ticks'] for row in rows] == ['3', '3']
+    assert set(PHASES) <= set(rows[0])
+    assert float(rows[0]['moveGhost']) > 0
+
+
+def test_ghost_swarm_collisions_use_tile_index(game_globals):
+    """Unit test for ghost collisions looked up by tile, with no drawing and hundreds of ghosts."""
+    import main
+
+    # Arrange: A swarm of 200 ghosts that have moved about, then one put diagonally next to the player
+    main.newGame(seed=0, ghost_count=200)
+    for ghost in main.ghosts:
+        for _ in range(ghost.speed * 3):
+            ghost.moveGhost()
+    main.player._Object__row, main.player._Object__col = 22, 15
+    for ghost in main.ghosts:
+        ghost._Object__row, ghost._Object__col = 2, 2
+        ghost.updateRect()
+    chaser = main.ghosts[-1]
+    chaser._Object__row, chaser._Object__col = 23, 16
+    chaser.updateRect()
+
+    # Act
+    main.player.checkGhostCollisions()
+
+    # Assert: Only the one ghost caught the player, who went back to the start
+    assert main.player.lives == 2
+    assert (main.player.readRow(), main.player.readCol()) == (18, 15)
+    assert main.ghostIndex().near(23, 16) == [chaser]
+
+
+def test_ghosts_are_views_of_one_entity_store(game_globals):
+    """Unit test for the struct-of-arrays store behind the ghosts' attributes."""
+    import main
+
+    # Arrange
+    main.newGame(seed=0)
+    store = main.ghosts[0].store
+
+    # Act: Change one ghost through its attributes and another through the store's columns
+    main.ghosts[1]._Object__row, main.ghosts[1]._Object__col = 5, 6
+    main.ghosts[1].mortality = True
+    store.direction[2] = 3
+
+    # Assert: Both sides see every change, and the tile index followed the move
+    assert all(ghost.store is store and ghost.slot == i for i, ghost in enumerate(main.ghosts))
+    assert (store.row[1], store.col[1], store.mortality[1]) == (5, 6, True)
+    assert main.ghosts[2].direction == 3
+    assert main.ghostIndex().near(5, 6) == [main.ghosts[1]]
+    with pytest.raises(AttributeError):
+        main.ghosts[0].colour = 'red'  # slots only, no per-object dict
+
+
+def test_level_pack_is_checked_compiled_and_cached(tmp_path):
+    """Unit test for loading, checking and caching a level pack."""
+    from levels import loadPack
+
+    # Arrange: A text pack of two boards, and a copy with a pellet walled off from the player
+    text = '# two small boards\nname: Small\nplayer: 1 1\nghosts: 3 3\n44444\n31023\n30403\n31013\n44444\n\n' \
+           'player: 3 3\nghosts: 1 1, 1 3\n44444\n31023\n30403\n31013\n44444\n'
+    pack_path = tmp_path / 'pack.txt'
+    pack_path.write_text(text)
+    broken_path = tmp_path / 'broken.txt'
+    broken_path.write_text(text.replace('30403\n31013', '34443\n31413', 1))
+
+    # Act: Load the pack twice, the second time from the compiled copy in the cache
+    pack = loadPack(str(pack_path), str(tmp_path / 'cache'))
+    cached = loadPack(str(pack_path), str(tmp_path / 'cache'))
+
+    # Assert: Each board is compiled with its spawns, masks and pellet count, and the cache gives the same boards
+    assert [board.name for board in pack] == ['Small', 'board 2']
+    assert pack[0].toLevel() == [row[:] for row in mock_level]
+    assert (pack[0].pellets, pack[0].player_spawn, pack[1].ghost_spawns) == (4, (1, 1), ((1, 1), (1, 3)))
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+    for board, copy in zip(pack, cached):
+        assert (copy.name, copy.tiles, copy.turn_masks, copy.pellets) == \
+               (board.name, board.tiles, board.turn_masks, board.pellets)
+    # The unreachable pellets are reported by its board and position
+    with pytest.raises(ValueError, match=r'Small: pellets at \(3, 1\), \(3, 3\) can\'t be reached'):
+        loadPack(str(broken_path))
+
+
+def test_generated_arena_is_a_valid_board():
+    """Unit test for the procedural arena generator."""
+    from levels import compilePack, generateArena
+
+    # Act: Generate and check arenas of odd and even sizes
+    arena = generateArena(41, 56, seed=5)
+    board = compilePack([arena, generateArena(16, 9, seed=1)])[0]
+
+    # Assert: The board passed every check at its own size, and a seed always gives the same maze
+    assert (board.rows, board.cols) == (41, 56)
+    assert board.player_spawn == (19, 27)
+    assert board.ghost_spawns == ((1, 1), (1, 53), (39, 1), (39, 53))
+    assert board.pellets > 41 * 56 // 3
+    assert generateArena(41, 56, seed=5) == arena
+    assert generateArena(41, 56, seed=6) != arena
+    with pytest.raises(ValueError):
+        generateArena(4, 30)
+
+
+def test_profiler_ignores_autopilot_search_ticks(game_globals, monkeypatch):
+    """Unit test for keeping the autopilot's simulated ticks out of the profiler."""
+    import main
+    from autopilot import Autopilot
+    from profiler import Profiler
+
+    # Arrange
+    main.newGame(seed=0)
+    profiler = Profiler()
+    monkeypatch.setattr(main, 'profiler', profiler)
+    pilot = Autopilot(budget=0.05, max_depth=3)
+
+    # Act: One decision, which plays many ticks ahead
+    profiler.mark()
+    pilot.decide()
+
+    # Assert: None of them counted as game ticks or game phases, and the profiler is back in place
+    assert pilot.nodes > 0
+    assert profiler.ticks == 0
+    assert all(seconds == 0 for seconds in profiler.current.values())
+    assert main.profiler is profiler
+
+
+def test_swarm_ghosts_are_eaten_one_at_a_time(game_globals):
+    """Unit test for eating one ghost of a swarm leaving the rest of its character frightened."""
+    import main
+
+    # Arrange
+    main.newGame(seed=0, ghost_count=8)
+    eaten, other = main.ghosts[0], main.ghosts[4]  # both character 0, moved apart from the corner they share
+    other._Object__row, other._Object__col = 6, 2
+    main.player.power = True
+    main.player._Object__row, main.player._Object__col = eaten.readRow(), eaten.readCol()
+
+    # Act
+    main.player.checkGhostCollisions()
+    state = main.GameState.snapshot()
+    eaten.eaten = other.eaten = False
+    state.restore()
+
+    # Assert: Only the touched ghost was eaten, the other one still flees, and snapshots keep each ghost's flag
+    assert (other.character, eaten.eaten, eaten.mortality) == (0, True, True)
+    assert not other.eaten and not other.mortality
+    assert other.findTarget(18, 15, None)[2] == 0.05 + 0.2  # fleeing adds to the randomness
+    assert main.player.eaten_ghosts == [True, False, False, False]
+
+
+def test_new_game_settings_are_arguments_not_the_command_line(game_globals, monkeypatch):
+    """Unit test for configuring a game through newGame() instead of the command line it was imported with."""
+    import main
+    from levels import compilePack, generateArena
+    pack = compilePack([generateArena(21, 25)])
+    monkeypatch.setattr(main.sys, 'argv', ['main.py', '--ghosts', '40', '--bfs-ghosts'])
+
+    # Act: A game with its own settings, then a new game that doesn't give any
+    main.newGame(seed=0, pack=pack, ghost_count=6, pathfinding='table')
+    main.newGame(seed=1)
+
+    # Assert: The second game kept the first one's settings and the command line was never read
+    assert main.level_pack is pack and main.currentBoard() is pack[0]
+    assert (len(main.ghosts), main.ghost_pathfinding) == (6, 'table')
+    with pytest.raises(ValueError, match='ghost pathfinding'):
+        main.newGame(pathfinding='astar')
+
+
+def test_greedy_policy_searches_once_per_tile(game_globals, monkeypatch):
+    """Unit test for the tournament's greedy bot only looking for a pellet again once it reaches a new tile."""
+    import main
+    import tournament
+    from simulation import Simulation
+    simulation = Simulation(seed=0)
+    searches = []
+    search = tournament.nearestPellet
+    monkeypatch.setattr(tournament, 'nearestPellet', lambda *args: searches.append(args[2]) or search(*args))
+    policy = tournament.greedyPolicy(0)
+
+    # Act: Steer with the bot, checking each move against a search from where the player is now
+    tiles = set()
+    for tick in range(200):
+        move = policy(simulation)
+        player = simulation.readPlayer()
+        cell = player.readRow() * main.currentMaze().cols + player.readCol()
+        tiles.add(cell)
+        assert move == search(main.currentMaze(), simulation.readLevel(), cell)
+        simulation.step(move)
+
+    # Assert: The player crossed many tiles in 200 ticks but was searched for far fewer times than that
+    assert set(searches) == tiles
+    assert len(tiles) > 5 and len(searches) < 200 // 2
+
+
+def test_player_animation_follows_ticks_not_frames(game_globals):
+    """Unit test for the player's animation moving on with the game rules, however often the player is drawn."""
+    import main
+    main.newGame(seed=0)
+    start = main.player.animation_counter
+    snapshot = main.GameState.snapshot()
+    drawn = Player(pygame.Surface((TILEWIDTH, TILEHEIGHT)), 1, 1, TILEWIDTH, TILEHEIGHT, 0, 0,
+                   [pygame.Surface((1, 1)) for _ in range(4)], 0, False, 0, 7)
+
+    # Act: Draw a player many times without a tick, then run some ticks of the game
+    for frame in range(10):
+        drawn.drawSprite()
+    for tick in range(6):
+        main.update()
+
+    # Assert: Only the ticks moved the animation on, and a snapshot puts it back
+    assert drawn.animation_counter == 0
+    assert main.player.animation_counter == start + 6
+    snapshot.restore()
+    assert main.player.animation_counter == start